@@ -0,0 +1,348 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from free_rooms import current_section
+from ics_export import current_week
+from ingest import (
+    END_MINUTE,
+    START_MINUTE,
+    TERM_WEEKS,
+    WEEKDAY_CODE,
+    format_minutes,
+    map_unique,
+    parse_weeks,
+    section_code,
+    weekday_code,
+)
+from keywords import CHANGE_COLUMN, PREPARE_COLUMN
+from reminder_scheduler import DEFAULT_LEAD_TIMES, LEAD_TIME_PRESETS, ReminderScheduler
+from timetable_store import DEFAULT_DB_PATH, TimetableStore
+
+# ---------------------- 课程表 JSON 接口 ----------------------
+# 监听地址和端口（可用环境变量 KCB_API_HOST / KCB_API_PORT 覆盖）
+API_HOST = os.environ.get("KCB_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("KCB_API_PORT", "8502"))
+
+# 响应缓存（按 ETag）和课程表缓存的条数上限
+RESPONSE_CACHE_SIZE = 256
+FRAME_CACHE_SIZE = 16
+
+# 客户端每次都带 If-None-Match 重新验证，内容没变时只返回 304
+CACHE_CONTROL = "no-cache"
+
+# 日程接口返回的字段
+SCHEDULE_COLUMNS = ["课程名", "星期", "节次", "开始", "结束", "教室", "课前准备", "备注", PREPARE_COLUMN, CHANGE_COLUMN]
+
+
+# 请求参数有误（返回 400）
+class BadRequest(ValueError):
+    pass
+
+
+# 资源不存在（返回 404）
+class NotFound(LookupError):
+    pass
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return str(value)
+
+
+def _json_bytes(data):
+    return json.dumps(data, ensure_ascii=False, default=_json_value).encode("utf-8")
+
+
+# 有上限的 LRU 字典（线程安全）
+class _LRU:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+# 接口逻辑（与 HTTP 无关，便于直接调用）：每个请求先算出"版本键"——课程表ID（内容哈希）、参数、
+# 以及提醒接口的当前生效提醒——再由版本键得到 ETag；ETag 没变时直接返回 304 或缓存的响应体，不重新查询和序列化
+class TimetableAPI:
+    def __init__(self, store):
+        self.store = store
+        self._responses = _LRU(RESPONSE_CACHE_SIZE)
+        self._frames = _LRU(FRAME_CACHE_SIZE)
+        self._schedulers = _LRU(FRAME_CACHE_SIZE * 4)
+        self._scheduler_lock = threading.Lock()
+        self.routes = {
+            "/api/timetables": self._timetables,
+            "/api/reminders": self._reminders,
+            "/api/schedule": self._schedule,
+            "/api/free-rooms": self._free_rooms,
+            "/api/statistics": self._statistics,
+        }
+
+    # 处理请求，返回 (状态码, ETag, 响应体)；if_none_match 命中时响应体为空
+    # 参数错误返回 400，资源不存在返回 404，其他异常（如课程表库损坏）返回 500，都带 {"error": ...} 响应体
+    def respond(self, path, query, if_none_match=None, now=None):
+        route = self.routes.get(path.rstrip("/"))
+        try:
+            if route is None:
+                raise NotFound(f"未知接口：{path}")
+            version, build = route(query, now or datetime.datetime.now())
+            etag = '"' + hashlib.sha1(repr((path, version)).encode("utf-8")).hexdigest()[:20] + '"'
+            if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+                return 304, etag, b""
+            body = self._responses.get(etag)
+            if body is None:
+                body = _json_bytes(build())
+                self._responses.put(etag, body)
+        except BadRequest as exc:
+            return 400, None, _json_bytes({"error": str(exc)})
+        except NotFound as exc:
+            return 404, None, _json_bytes({"error": str(exc)})
+        except Exception as exc:
+            return 500, None, _json_bytes({"error": f"{type(exc).__name__}: {exc}"})
+        return 200, etag, body
+
+    # ---------------- 参数 ----------------
+    @staticmethod
+    def _param(query, name, default=None):
+        values = query.get(name)
+        return values[0] if values else default
+
+    @classmethod
+    def _date(cls, query, now):
+        text = cls._param(query, "date")
+        if text is None:
+            return now.date()
+        try:
+            return datetime.date.fromisoformat(text)
+        except ValueError:
+            raise BadRequest(f"日期格式应为 YYYY-MM-DD：{text}") from None
+
+    @classmethod
+    def _int(cls, query, name, low, high, default=None):
+        text = cls._param(query, name)
+        if text is None:
+            if default is None:
+                raise BadRequest(f"缺少参数：{name}")
+            return default
+        try:
+            value = int(text)
+        except ValueError:
+            raise BadRequest(f"{name} 应为整数：{text}") from None
+        if not low <= value <= high:
+            raise BadRequest(f"{name} 应在 {low}-{high} 之间：{value}")
+        return value
+
+    # 课程表ID：未指定时使用最近保存的课程表；按前缀查找走主键索引，不读取整个课程表列表
+    def _timetable_id(self, query):
+        timetable_id = self._param(query, "timetable")
+        matches = self.store.find_timetables(timetable_id)
+        if timetable_id is None:
+            if not matches:
+                raise NotFound("课程表库中还没有课程表")
+            return matches[0]
+        if len(matches) != 1:
+            raise NotFound(f"找不到课程表：{timetable_id}")
+        return matches[0]
+
+    # 课程表内容（课程表ID即内容哈希，按ID缓存不会过期）
+    def _frame(self, timetable_id):
+        course_df = self._frames.get(timetable_id)
+        if course_df is None:
+            course_df = self.store.load(timetable_id)
+            self._frames.put(timetable_id, course_df)
+        return course_df
+
+    # 第 date 天在上课周内的课程：给出 week（或 term_start 推算周次）时按周次位图过滤，否则只按星期
+    def _day_courses(self, course_df, date, week):
+        day = course_df[course_df[WEEKDAY_CODE] == date.isoweekday()]
+        if week is not None:
+            masks = map_unique(day["周次"], parse_weeks).to_numpy(dtype=np.int64)
+            day = day[((masks >> (week - 1)) & 1).astype(bool)]
+        return day
+
+    def _week(self, query, date):
+        term_start = self._param(query, "term_start")
+        if term_start is not None:
+            try:
+                return current_week(datetime.date.fromisoformat(term_start), date)
+            except ValueError:
+                raise BadRequest(f"日期格式应为 YYYY-MM-DD：{term_start}") from None
+        if self._param(query, "week") is not None:
+            return self._int(query, "week", 1, TERM_WEEKS)
+        return None
+
+    # ---------------- 接口 ----------------
+    def _timetables(self, query, now):
+        saved = self.store.list_timetables()
+        return tuple(saved["id"]), lambda: saved.to_dict("records")
+
+    # 当前生效的提醒；lead 为逗号分隔的提前量（默认课前1小时、30分钟），版本键包含当前生效的提醒，
+    # 同一个提醒窗口内轮询得到的 ETag 不变
+    def _reminders(self, query, now):
+        timetable_id = self._timetable_id(query)
+        at = self._param(query, "at")
+        if at is not None:
+            try:
+                now = datetime.datetime.fromisoformat(at)
+            except ValueError:
+                raise BadRequest(f"时间格式应为 YYYY-MM-DDTHH:MM：{at}") from None
+        leads = tuple(self._param(query, "lead", ",".join(DEFAULT_LEAD_TIMES)).split(","))
+        unknown = [lead for lead in leads if lead not in LEAD_TIME_PRESETS]
+        if unknown:
+            raise BadRequest(f"未知的提前量：{','.join(unknown)}（可选 {','.join(LEAD_TIME_PRESETS)}）")
+
+        key = (timetable_id, leads, now.date())
+        with self._scheduler_lock:
+            scheduler = self._schedulers.get(key)
+            if scheduler is None:
+                scheduler = ReminderScheduler(self._frame(timetable_id), leads, now.date())
+                self._schedulers.put(key, scheduler)
+            reminders = scheduler.active(now)
+        version = (timetable_id, leads, tuple((item["kind"], item["date"], item["row"]) for item in reminders))
+        return version, lambda: {"timetable": timetable_id, "reminders": reminders}
+
+    # 某天的课程（默认今天）；week 或 term_start 用于排除不在上课周的课程
+    def _schedule(self, query, now):
+        timetable_id = self._timetable_id(query)
+        date = self._date(query, now)
+        week = self._week(query, date)
+
+        def build():
+            day = self._day_courses(self._frame(timetable_id), date, week).sort_values(START_MINUTE, kind="stable")
+            day = day.assign(
+                开始=map_unique(day[START_MINUTE], lambda minutes: None if pd.isna(minutes) else format_minutes(int(minutes))),
+                结束=map_unique(day[END_MINUTE], lambda minutes: None if pd.isna(minutes) else format_minutes(int(minutes))),
+            )[SCHEDULE_COLUMNS]
+            return {
+                "timetable": timetable_id,
+                "date": date.isoformat(),
+                "week": week,
+                "courses": day.astype(object).where(day.notna(), None).to_dict("records"),
+            }
+
+        return (timetable_id, date, week), build
+
+    # 某周某天某节的空闲教室（weekday 为 1-7 或"星期三"，默认今天；section 默认当前节次）
+    # 未指定 section 且当前已过最后一节课时，返回 "section": null 和空的教室列表
+    def _free_rooms(self, query, now):
+        timetable_id = self._timetable_id(query)
+        week = self._int(query, "week", 1, TERM_WEEKS)
+        weekday = weekday_code(self._param(query, "weekday", now.isoweekday()))
+        section = self._param(query, "section")
+        if section is None:
+            section = current_section(now)
+            code = section_code(section) if section is not None else None
+        else:
+            code = section_code(section)
+            if code is None:
+                raise BadRequest(f"无法识别的节次：{section}")
+        if weekday is None:
+            raise BadRequest("无法识别的星期")
+
+        def build():
+            rooms = self.store.free_rooms(timetable_id, week, weekday, code) if code is not None else []
+            return {"timetable": timetable_id, "week": week, "weekday": weekday, "section": code, "rooms": rooms}
+
+        return (timetable_id, week, weekday, code), build
+
+    def _statistics(self, query, now):
+        timetable_id = self._timetable_id(query)
+        return timetable_id, lambda: {"timetable": timetable_id, **self.store.statistics(timetable_id)}
+
+
+class _APIHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        status, etag, body = self.server.api.respond(
+            url.path, parse_qs(url.query), self.headers.get("If-None-Match")
+        )
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", CACHE_CONTROL)
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+# HTTP 服务器：与 Streamlit 应用读同一个课程表库
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, store, host=API_HOST, port=API_PORT, quiet=False):
+        super().__init__((host, port), _APIHandler)
+        self.api = TimetableAPI(store)
+        self.quiet = quiet
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    # 在后台线程中运行（用于测试或嵌入其他进程），返回服务器本身
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+# ---------------------- 命令行入口 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="启动课程表 JSON 接口（今日课程、提醒、空教室、统计）")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="课程表库文件（与 Streamlit 应用相同）")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--quiet", action="store_true", help="不输出访问日志")
+    args = parser.parse_args(argv)
+
+    store = TimetableStore(args.db)
+    server = APIServer(store, args.host, args.port, args.quiet)
+    print(f"课程表接口已启动：http://{args.host}:{server.port}/api/（timetables / reminders / schedule / free-rooms / statistics）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
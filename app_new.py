@@ -1,101 +1,158 @@
 import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
 import datetime
 import time
 import plotly.express as px
 import plotly.graph_objects as go
 
-# ---------------------- 1. 本地关键词解析（替代百度NLP） ----------------------
-# 课前准备关键词库（可自定义扩展）
-PREPARE_KEYWORDS = ["课本", "习题集", "作业", "耳机", "U盘", "实验报告", "笔记本"]
-# 调课关键词库
-CHANGE_KEYWORDS = ["调至", "改为", "临时变更", "替换", "调整"]
+from charts import TOP_N, binned_bar_chart, keyword_counts, pie_chart, rank_chart, treemap_chart
+from columnar_cache import DERIVED_COLUMNS, INTERNAL_COLUMNS
+from conflict_detector import SLOT_COLUMNS, detect_room_conflicts
+from excel_export import XLSX_MIME, export_excel_bytes, sample_timetable_bytes
+from free_rooms import OCCUPANCY_COLUMNS, SECTIONS, OccupancyIndex, current_section
+from ics_export import calendar_bytes
+from ingest import (
+    CLASS_TIME_MAP,
+    SECTION_CODE,
+    TERM_WEEKS,
+    WEEKDAY_CODE,
+    WEEKDAY_LABELS,
+    canonicalize,
+)
+from keywords import parse_keywords
+from schedule_merge import detect_time_clashes, merge_timetables
+from reminder_log import DeliveryLog, delivery_key
+from reminder_scheduler import DEFAULT_LEAD_TIMES, LEAD_TIME_PRESETS, ReminderScheduler
+from search_index import SearchIndex
+from session_memory import SessionRegistry, format_bytes, rehydrate, state_bytes
+from shared_cache import open_backend
+from timetable_store import TimetableStore
+from upload_jobs import FAILED, POLL_INTERVAL, QUEUED, UploadJobQueue, UploadRejected
+from utilization import AXES, MAX_HEATMAP_ROOMS, UtilizationCube
+from week_grid import WeekGrid
+from workbook_ingest import SHEET_ERRORS
 
-# 本地解析课前准备关键词
-def extract_prepare_keywords(text):
-    if pd.isna(text) or text == "":
-        return []
-    text = str(text).lower()
-    matched = [kw for kw in PREPARE_KEYWORDS if kw in text]
-    return matched if matched else ["无明确准备项"]
+# ---------------------- 1. 课程表解析与提醒逻辑 ----------------------
+# 教室冲突检测（只传入时段相关字段，按内容缓存）
+@st.cache_data(show_spinner=False)
+def cached_room_conflicts(slot_df):
+    return detect_room_conflicts(slot_df)
 
-# 本地解析调课信息
-def extract_change_keywords(text):
-    if pd.isna(text) or text == "":
-        return []
-    text = str(text).lower()
-    matched = [kw for kw in CHANGE_KEYWORDS if kw in text]
-    return matched if matched else ["无调课信息"]
+# 空教室占用索引（保存在会话中，课程表变化时只增量更新变化的行）
+def get_occupancy_index(course_df):
+    if 'occupancy_index' not in st.session_state:
+        st.session_state.occupancy_index = OccupancyIndex()
+        st.session_state.occupancy_source = None
+    if st.session_state.occupancy_source is not course_df:
+        st.session_state.occupancy_index.update(course_df[OCCUPANCY_COLUMNS])
+        st.session_state.occupancy_source = course_df
+    return st.session_state.occupancy_index
 
-# ---------------------- 2. 课程表解析与提醒逻辑 ----------------------
-# 节次-上课时间映射（可按学校作息修改）
-CLASS_TIME_MAP = {
-    "1": "08:00", "2": "08:50", "3": "10:00", "4": "10:50",
-    "5": "14:00", "6": "14:50", "7": "16:00", "8": "16:50",
-    "9": "19:00", "10": "19:50", "11": "20:40"
-}
+# 教室使用率立方体（保存在会话中，由占用索引生成，课程表变化时重新生成；各维度的汇总缓存在立方体中）
+def get_utilization_cube(course_df):
+    if st.session_state.get('utilization_source') is not course_df:
+        st.session_state.utilization_cube = UtilizationCube(get_occupancy_index(course_df))
+        st.session_state.utilization_source = course_df
+    return st.session_state.utilization_cube
 
-# 计算当前时间与上课时间的差值（分钟）
-def get_time_diff(class_time):
-    now = datetime.datetime.now().strftime("%H:%M")
-    now_h, now_m = map(int, now.split(":"))
-    class_h, class_m = map(int, class_time.split(":"))
-    # 计算时间差（正数=还没到上课时间，负数=已过）
-    diff = (class_h - now_h) * 60 + (class_m - now_m)
-    return diff
+# 全文搜索索引（保存在会话中，课程表变化时只为新增/消失的内容更新倒排表）
+def get_search_index(course_df):
+    if 'search_index' not in st.session_state:
+        st.session_state.search_index = SearchIndex()
+        st.session_state.search_source = None
+    if st.session_state.search_source is not course_df:
+        st.session_state.search_index.update(course_df)
+        st.session_state.search_source = course_df
+    return st.session_state.search_index
 
-# 智能提醒判断
-def check_reminder(course_df):
-    reminders = []
-    # 获取今天星期（1=周一，7=周日）
-    today_week_num = datetime.datetime.now().weekday() + 1
-    today_week_str = f"星期{today_week_num}"
-    
-    # 筛选今天的课程
-    today_courses = course_df[course_df["星期"] == today_week_str].reset_index(drop=True)
-    
-    for idx, course in today_courses.iterrows():
-        class_section = str(course["节次"])
-        # 匹配上课时间
-        class_time = CLASS_TIME_MAP.get(class_section, "")
-        if not class_time:
-            continue
-        
-        # 计算时间差，触发不同提醒
-        time_diff = get_time_diff(class_time)
-        course_name = course["课程名"]
-        classroom = course["教室"]
-        prepare_keywords = course["准备项关键词"]
-        change_info = course["调课关键词"]
-        
-        # 1. 课前1小时提醒（55-65分钟内）
-        if 55 <= time_diff <= 65:
-            reminders.append({
-                "type": "hour_before",
-                "content": f"⏰ 课前1小时提醒 | {course_name}（{classroom}）\n需准备：{','.join(prepare_keywords)}",
-                "course": course_name,
-                "time": class_time
-            })
-        # 2. 课前30分钟提醒（25-35分钟内）
-        elif 25 <= time_diff <= 35:
-            reminders.append({
-                "type": "half_hour_before",
-                "content": f"🚨 课前30分钟提醒 | {course_name}即将开始！\n教室：{classroom}",
-                "course": course_name,
-                "time": class_time
-            })
-        # 3. 调课提醒（识别到调课关键词）
-        if change_info != ["无调课信息"]:
-            reminders.append({
-                "type": "change",
-                "content": f"📢 调课提醒 | {course_name}\n备注：{course['备注']}",
-                "course": course_name,
-                "time": class_time
-            })
-    
-    return reminders
+# 周课表（保存在会话中，课程表变化时重新构建布局；各周的渲染结果缓存在周课表对象中）
+def get_week_grid(course_df):
+    if st.session_state.get('week_grid_source') is not course_df:
+        st.session_state.week_grid = WeekGrid(course_df)
+        st.session_state.week_grid_source = course_df
+    return st.session_state.week_grid
+
+# 提醒调度器（保存在会话中，课程表、日期或提前量设置变化时重新生成当天和次日的提醒事件）
+def get_reminder_scheduler(course_df, lead_times):
+    today = datetime.date.today()
+    key = (today, tuple(lead_times))
+    if st.session_state.get('reminder_source') is not course_df or st.session_state.get('reminder_key') != key:
+        st.session_state.reminder_scheduler = ReminderScheduler(course_df, lead_times, today)
+        st.session_state.reminder_source = course_df
+        st.session_state.reminder_key = key
+    return st.session_state.reminder_scheduler
+
+# 提醒投递记录（所有会话共享，每条提醒对每个用户只弹出一次，确认后不再显示）
+@st.cache_resource
+def get_delivery_log():
+    return DeliveryLog()
+
+# 当前用户（以会话区分）
+def current_user():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "local"
+
+# 本地课程表库（所有会话共享一个实例，内部使用连接池）
+@st.cache_resource
+def get_timetable_store():
+    return TimetableStore()
+
+# 后台解析任务队列（所有会话共享，同一文件的重复提交合并为一个任务）
+# 设置 KCB_CACHE_URL 后，多个副本通过共享缓存复用彼此的解析结果
+@st.cache_resource
+def get_upload_jobs():
+    return UploadJobQueue(backend=open_backend())
+
+# 提交上传的文件并返回对应任务（同一次上传只在第一次计算内容哈希）
+def get_upload_job(uploaded_file):
+    jobs = get_upload_jobs()
+    job = jobs.get(st.session_state.get('upload_job_id'))
+    if job is None or st.session_state.get('upload_file_id') != uploaded_file.file_id:
+        job = jobs.submit(uploaded_file.getvalue(), uploaded_file.name)
+        st.session_state.upload_file_id = uploaded_file.file_id
+        st.session_state.upload_job_id = job.id
+    return job
+
+# 会话登记表（所有会话共享，用于统计内存并换出长时间不活跃的会话）
+@st.cache_resource
+def get_session_registry():
+    return SessionRegistry(is_alive=session_alive)
 
-# ---------------------- 3. 现代化Streamlit界面 ----------------------
+# 会话是否仍连接（没有 Streamlit 运行时时无法判断，视为仍连接）
+def session_alive(session_id):
+    if not runtime.exists():
+        return True
+    return runtime.get_instance().is_active_session(session_id)
+
+# 每次重跑时：恢复被换出的课程表、记录本会话活跃，并顺带换出其他空闲会话
+def track_session():
+    rehydrate(st.session_state)
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        registry = get_session_registry()
+        # ctx.session_state 是每次运行新建的包装对象，登记其内部、跨重跑不变的会话状态对象
+        registry.touch(ctx.session_id, getattr(ctx.session_state, "_state", ctx.session_state))
+        registry.evict_idle()
+
+# 解析结果导出（去掉内部的规范化列，同一份课程表只生成一次）
+def get_export_bytes(course_df):
+    if st.session_state.get('export_source') is not course_df:
+        st.session_state.export_bytes = export_excel_bytes(course_df.drop(columns=INTERNAL_COLUMNS, errors="ignore"))
+        st.session_state.export_source = course_df
+    return st.session_state.export_bytes
+
+# 日历文件（同一份课程表、同一个学期开始日期每天只生成一次；备注中的"本周"按当天解析）
+def get_calendar_bytes(course_df, term_start):
+    key = (term_start, datetime.date.today())
+    if st.session_state.get('calendar_source') is not course_df or st.session_state.get('calendar_key') != key:
+        st.session_state.calendar_bytes = calendar_bytes(course_df, term_start)
+        st.session_state.calendar_source = course_df
+        st.session_state.calendar_key = key
+    return st.session_state.calendar_bytes
+
+# ---------------------- 2. 现代化Streamlit界面 ----------------------
 def main():
     # 页面基础配置
     st.set_page_config(
@@ -104,6 +161,7 @@ def main():
         layout="wide",
         initial_sidebar_state="expanded"
     )
+    track_session()
     
     # 自定义CSS样式
     st.markdown("""
@@ -225,14 +283,31 @@ def main():
             - 课程名（如：高等数学）
             - 周次（如：1-16周）
             - 星期（如：星期三）
-            - 节次（如：3）
+            - 节次（如：3，连堂课写 3-4）
             - 教室（如：3教201）
             - 课前准备（如：带习题集）
             - 备注（如：调至周五第6节）
             """)
     
+        # 会话内存占用
+        with st.expander("🧮 会话内存", expanded=False):
+            usage = state_bytes(st.session_state)
+            st.metric("本会话占用", format_bytes(sum(usage.values())))
+            st.dataframe(
+                pd.DataFrame({"状态": list(usage), "占用": [format_bytes(size) for size in usage.values()]}),
+                use_container_width=True,
+                hide_index=True
+            )
+            # 统计全部会话需要遍历每个会话的课程表，只在点击时计算
+            if st.button("📏 统计全部会话", use_container_width=True):
+                sessions = get_session_registry().usage()
+                st.caption(
+                    f"全部 {len(sessions)} 个会话共占用 {format_bytes(int(sessions['内存字节'].sum()))}，"
+                    f"其中 {int(sessions['已换出'].sum())} 个空闲会话已换出到磁盘"
+                )
+    
     # 主内容区域 - 选项卡设计
-    tab1, tab2, tab3, tab4 = st.tabs(["📤 上传课程表", "🧠 AI智能解析", "🔔 实时提醒", "📊 数据统计"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📤 上传课程表", "🧠 AI智能解析", "🔔 实时提醒", "📊 数据统计", "🏫 空教室查询"])
     
     with tab1:
         st.markdown('<div class="step-card">', unsafe_allow_html=True)
@@ -247,7 +322,7 @@ def main():
             uploaded_file = st.file_uploader(
                 "选择课程表文件",
                 type=["xlsx"],
-                help="请上传包含完整课程信息的Excel文件",
+                help="请上传包含完整课程信息的Excel文件，多个班级可放在同一工作簿的不同工作表中",
                 label_visibility="collapsed"
             )
         
@@ -258,43 +333,47 @@ def main():
                 <p>如果没有课程表，可以下载示例文件：</p>
             </div>
             """, unsafe_allow_html=True)
-            if st.button("📥 下载示例课程表", type="secondary"):
-                # 创建示例数据
-                sample_data = {
-                    '课程名': ['高等数学', '大学英语', '计算机基础'],
-                    '周次': ['1-16周', '1-16周', '1-16周'],
-                    '星期': ['星期三', '星期三', '星期四'],
-                    '节次': [3, 5, 2],
-                    '教室': ['3教201', '语音室1', '机房5'],
-                    '课前准备': [
-                        '带微积分习题集+完成P20作业',
-                        '带英语课本+听力耳机',
-                        '带U盘+完成实验报告1'
-                    ],
-                    '备注': [
-                        '-',
-                        '本周调至星期五第6节',
-                        '-'
-                    ]
-                }
-                sample_df = pd.DataFrame(sample_data)
-                st.download_button(
-                    "下载Excel文件",
-                    data=sample_df.to_excel(index=False, engine='openpyxl'),
-                    file_name="课程表示例.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+            st.download_button(
+                "📥 下载示例课程表",
+                data=sample_timetable_bytes(),
+                file_name="课程表示例.xlsx",
+                mime=XLSX_MIME,
+                type="secondary"
+            )
         
         if uploaded_file:
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.subheader("📋 课程表预览")
             
-            # 读取并展示课程表
-            course_df = pd.read_excel(uploaded_file)
+            # 后台读取并解析课程表，解析期间只轮询任务状态（同一文件解析过一次后直接从列式缓存加载）
+            # 文件过大时直接提示；解析任务过多时排队已满，稍后自动重试
+            try:
+                job = get_upload_job(uploaded_file)
+            except UploadRejected as exc:
+                st.warning(f"⚠️ {exc}")
+                if exc.retry:
+                    time.sleep(POLL_INTERVAL * 4)
+                    st.rerun()
+                return
+            if not job.finished:
+                stage = job.stage
+                if job.status == QUEUED:
+                    stage = f"排队中（第 {get_upload_jobs().position(job.id) or 1} 位）"
+                st.progress(job.progress, text=f"⏳ {stage}…（{uploaded_file.name}）")
+                time.sleep(POLL_INTERVAL)
+                st.rerun()
+            if job.status == FAILED:
+                st.error(f"❌ 课程表读取失败：{job.error}")
+                return
+            course_df = job.result
+            
+            # 多工作表课程表（每个班级一个工作表）：提示未能导入的工作表
+            for sheet, error in course_df.attrs.get(SHEET_ERRORS, {}).items():
+                st.warning(f"⚠️ 工作表「{sheet}」未导入：{error}")
             
             # 格式化显示
             st.dataframe(
-                course_df,
+                course_df.drop(columns=DERIVED_COLUMNS, errors="ignore"),
                 use_container_width=True,
                 column_config={
                     "课程名": st.column_config.TextColumn("课程名称", help="课程的具体名称"),
@@ -314,11 +393,80 @@ def main():
                 st.success("✅ 课程表格式验证通过！")
             
             st.markdown('</div>', unsafe_allow_html=True)
-            st.session_state.course_df = course_df
+            # 解析完成的课程表只在任务完成后挂到会话上一次，之后的重跑不会覆盖解析结果
+            if st.session_state.get('attached_job_id') != job.id:
+                st.session_state.course_df = canonicalize(course_df)
+                st.session_state.attached_job_id = job.id
             
             # 解析按钮
             if st.button("🚀 开始AI智能解析", type="primary", use_container_width=True):
                 st.session_state.active_tab = "analysis"
+        
+        # 从本地库加载已解析的课程表
+        saved = get_timetable_store().list_timetables()
+        if len(saved) > 0:
+            with st.expander("📂 从本地库加载课程表", expanded=False):
+                st.caption("之前解析过的课程表会保存在本地库中，重启后可直接加载")
+                saved_names = {
+                    row.id: f"{row.name}（{row.row_count} 门课程）" for row in saved.itertuples(index=False)
+                }
+                saved_id = st.selectbox("选择课程表", list(saved_names), format_func=saved_names.get, key="saved_timetable")
+                if st.button("📂 加载", use_container_width=True):
+                    st.session_state.course_df = get_timetable_store().load(saved_id)
+                    st.session_state.timetable_id = saved_id
+                    st.success("✅ 已加载课程表")
+        
+        # 合并多份课程表（选课冲突检测）
+        with st.expander("🧩 合并多个课程表（选课冲突检测）", expanded=False):
+            st.caption("同时上传多份课程表（如必修课表 + 多份选修课表），合并为一张表并检测上课时间冲突")
+            merge_files = st.file_uploader(
+                "选择多个课程表文件",
+                type=["xlsx"],
+                accept_multiple_files=True,
+                key="merge_files"
+            )
+            
+            # 每个文件走与单个上传相同的后台解析（列式缓存、多工作表、字段校验），全部解析完成后再合并
+            if merge_files and st.button("🧩 合并并检测冲突", use_container_width=True):
+                try:
+                    st.session_state.merge_job_ids = [
+                        get_upload_jobs().submit(file.getvalue(), file.name).id for file in merge_files
+                    ]
+                    st.session_state.merge_names = [file.name for file in merge_files]
+                except UploadRejected as exc:
+                    st.warning(f"⚠️ {exc}")
+            
+            merge_jobs = [get_upload_jobs().get(job_id) for job_id in st.session_state.get('merge_job_ids', [])]
+            if merge_jobs:
+                pending = [job for job in merge_jobs if job is not None and not job.finished]
+                if pending:
+                    done = len(merge_jobs) - len(pending)
+                    st.progress(done / len(merge_jobs), text=f"⏳ 正在解析课程表（{done}/{len(merge_jobs)}）…")
+                    time.sleep(POLL_INTERVAL)
+                    st.rerun()
+                merge_names = st.session_state.pop('merge_names')
+                del st.session_state['merge_job_ids']
+                failed = [
+                    f"{name}：{'解析结果已过期，请重新合并' if job is None else job.error}"
+                    for name, job in zip(merge_names, merge_jobs) if job is None or job.status == FAILED
+                ]
+                error = "课程表读取失败：" + "；".join(failed) if failed else None
+                if not failed:
+                    try:
+                        merged_df = merge_timetables([job.result for job in merge_jobs], merge_names)
+                    except ValueError as exc:
+                        error = str(exc)
+                if error:
+                    st.error(f"❌ {error}")
+                else:
+                    clashes = detect_time_clashes(merged_df)
+                    st.session_state.course_df = merged_df
+                    
+                    if len(clashes) > 0:
+                        st.error(f"⚠️ 发现 {len(clashes)} 处上课时间冲突")
+                        st.dataframe(clashes.drop(columns=["分组"]), use_container_width=True)
+                    else:
+                        st.success(f"✅ 已合并 {len(merge_names)} 份课程表，共 {len(merged_df)} 门课程，无时间冲突")
     
     with tab2:
         if 'course_df' not in st.session_state:
@@ -341,10 +489,12 @@ def main():
                     
                     # 执行解析
                     course_df = st.session_state.course_df.copy()
-                    course_df["准备项关键词"] = course_df["课前准备"].apply(extract_prepare_keywords)
-                    course_df["调课关键词"] = course_df["备注"].apply(extract_change_keywords)
+                    # 解析课前准备/调课关键词（相同文本只解析一次）
+                    course_df = parse_keywords(course_df)
                     
                     st.session_state.course_df = course_df
+                    # 保存到本地库，重启后无需重新上传解析
+                    st.session_state.timetable_id = get_timetable_store().save(course_df)
                 
                 st.success("✅ AI解析完成！")
         
@@ -359,16 +509,16 @@ def main():
                 st.markdown("### 📚 课程总览")
                 st.metric("总课程数", len(st.session_state.course_df))
                 
-                # 课程分布图
+                # 课程分布图（前10门 + 其他，课程再多图表大小也不变）
                 course_count = st.session_state.course_df['课程名'].value_counts()
                 if len(course_count) > 0:
-                    fig = px.pie(values=course_count.values, names=course_count.index, 
-                               title="课程分布")
+                    fig = pie_chart(course_count, "课程分布")
                     st.plotly_chart(fig, use_container_width=True)
             
             with col2:
                 st.markdown("### 🕒 时间分布")
-                week_distribution = st.session_state.course_df['星期'].value_counts()
+                week_distribution = st.session_state.course_df[WEEKDAY_CODE].value_counts().sort_index()
+                week_distribution.index = [WEEKDAY_LABELS[code - 1] for code in week_distribution.index]
                 if len(week_distribution) > 0:
                     fig = px.bar(x=week_distribution.index, y=week_distribution.values,
                                title="每日课程数量", labels={'x': '星期', 'y': '课程数量'})
@@ -376,7 +526,7 @@ def main():
             
             with col3:
                 st.markdown("### ⚠️ 注意事项")
-                changes = st.session_state.course_df[st.session_state.course_df['调课关键词'] != ['无调课信息']]
+                changes = st.session_state.course_df[st.session_state.course_df['调课关键词'].map(lambda kws: kws != ['无调课信息'])]
                 st.metric("调课数量", len(changes))
                 
                 if len(changes) > 0:
@@ -387,12 +537,34 @@ def main():
             st.markdown("### 📋 详细解析结果")
             display_cols = ['课程名', '教室', '星期', '节次', '准备项关键词', '调课关键词']
             if '调课关键词' in st.session_state.course_df.columns:
+                # 搜索课程名、教室、课前准备、备注（倒排索引，大课程表也无需逐行扫描）
+                query = st.text_input(
+                    "🔍 搜索",
+                    placeholder="输入课程名、教室、准备事项或备注，多个词用空格分隔",
+                    key="course_search"
+                )
+                result_df = st.session_state.course_df
+                if query.strip():
+                    rows = get_search_index(result_df).search(query)
+                    result_df = result_df.iloc[rows]
+                    st.caption(f"找到 {len(result_df)} 条匹配的课程")
                 st.dataframe(
-                    st.session_state.course_df[display_cols],
+                    result_df[display_cols],
+                    use_container_width=True
+                )
+            
+            # 导出解析结果
+            if st.session_state.get('export_source') is st.session_state.course_df or st.button("📦 生成解析结果Excel", use_container_width=True):
+                st.download_button(
+                    "📥 下载解析结果",
+                    data=get_export_bytes(st.session_state.course_df),
+                    file_name="课程表解析结果.xlsx",
+                    mime=XLSX_MIME,
                     use_container_width=True
                 )
     
-    with tab3:
+    # 提醒页的重跑优先于后台解析：期间解析降为低优先级（并发数降低，阶段之间短暂让出）
+    with tab3, get_upload_jobs().interactive():
         if 'course_df' not in st.session_state:
             st.info("👆 请先完成课程表上传和解析")
             return
@@ -408,18 +580,37 @@ def main():
             if st.button("🔄 刷新提醒", type="primary", use_container_width=True):
                 st.rerun()
         
-        # 提醒内容
-        reminders = check_reminder(st.session_state.course_df)
+        # 提醒时间设置（每个用户在自己的会话中选择）
+        lead_times = st.multiselect(
+            "⏱️ 提醒时间",
+            list(LEAD_TIME_PRESETS),
+            default=list(DEFAULT_LEAD_TIMES),
+            format_func=lambda name: LEAD_TIME_PRESETS[name].label,
+            key="reminder_lead_times",
+        )
+        
+        # 提醒内容：新生效的提醒只弹出一次，未确认的提醒保留在列表中
+        user = current_user()
+        delivered, reminders = get_reminder_scheduler(st.session_state.course_df, lead_times).deliver(
+            get_delivery_log(), user
+        )
+        for reminder in delivered:
+            st.toast(reminder["content"].split("\n")[0])
         
         if reminders:
             st.markdown("### 🎯 当前提醒")
-            for reminder in reminders:
+            for i, reminder in enumerate(reminders):
                 if reminder["type"] == "hour_before":
                     st.markdown(f'<div class="alert-hour">{reminder["content"]}</div>', unsafe_allow_html=True)
                 elif reminder["type"] == "half_hour_before":
                     st.markdown(f'<div class="alert-half">{reminder["content"]}</div>', unsafe_allow_html=True)
+                elif reminder["type"] == "evening_before":
+                    st.markdown(f'<div class="alert-hour">{reminder["content"]}</div>', unsafe_allow_html=True)
                 elif reminder["type"] == "change":
                     st.markdown(f'<div class="alert-change">{reminder["content"]}</div>', unsafe_allow_html=True)
+                if st.button("✅ 知道了", key=f"ack_reminder_{i}"):
+                    get_delivery_log().ack(delivery_key(user, reminder))
+                    st.rerun()
         else:
             st.markdown("""
             <div class="success-box">
@@ -453,8 +644,21 @@ def main():
                     准备事项：{test_preparation}
                 </div>
                 """, unsafe_allow_html=True)
+        
+        # 导出为手机日历
+        with st.expander("📅 导出到手机日历（.ics）", expanded=False):
+            st.caption("按周次生成每周重复的日历事件，备注中的调课会作为单次例外导入")
+            term_start = st.date_input("第1周星期一", value=datetime.date.today(), key="ics_term_start")
+            st.download_button(
+                "📥 下载日历文件",
+                data=get_calendar_bytes(st.session_state.course_df, term_start),
+                file_name="课程表.ics",
+                mime="text/calendar",
+                use_container_width=True
+            )
     
-    with tab4:
+    # 统计页的重跑优先于后台解析：期间解析降为低优先级（并发数降低，阶段之间短暂让出）
+    with tab4, get_upload_jobs().interactive():
         if 'course_df' not in st.session_state:
             st.info("👆 请先完成课程表上传和解析")
             return
@@ -499,7 +703,7 @@ def main():
             """.format(unique_classrooms), unsafe_allow_html=True)
         
         with col4:
-            changes = course_df[course_df['调课关键词'] != ['无调课信息']]
+            changes = course_df[course_df['调课关键词'].map(lambda kws: kws != ['无调课信息'])]
             change_count = len(changes)
             st.markdown("""
             <div class="stats-card">
@@ -509,17 +713,26 @@ def main():
             </div>
             """.format(change_count), unsafe_allow_html=True)
         
+        # 周课表（布局只在课程表变化时构建一次，切换周次只筛选格子中的课程）
+        st.markdown("### 🗓️ 周课表")
+        week_grid = get_week_grid(course_df)
+        grid_week = st.selectbox(
+            "周次",
+            [None] + week_grid.weeks,
+            format_func=lambda week: "全学期" if week is None else f"第{week}周",
+            key="grid_week"
+        )
+        st.markdown(week_grid.render(grid_week), unsafe_allow_html=True)
+        
         # 详细分析图表
         col1, col2 = st.columns(2)
         
         with col1:
             # 每日课程分布
             st.markdown("### 📅 每日课程分布")
-            week_dist = course_df['星期'].value_counts().sort_index()
-            
-            # 按星期顺序排序
-            week_order = ['星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日']
-            week_dist = week_dist.reindex([day for day in week_order if day in week_dist.index])
+            # 按星期码统计并排序（星期一到星期日）
+            week_dist = course_df[WEEKDAY_CODE].value_counts().sort_index()
+            week_dist.index = [WEEKDAY_LABELS[code - 1] for code in week_dist.index]
             
             fig = px.bar(x=week_dist.index, y=week_dist.values,
                         title="每日课程数量", 
@@ -531,7 +744,7 @@ def main():
         with col2:
             # 节次分布
             st.markdown("### 🕐 节次分布")
-            section_dist = course_df['节次'].value_counts().sort_index()
+            section_dist = course_df[SECTION_CODE].value_counts().sort_index()
             
             fig = px.bar(x=[f"第{section}节" for section in section_dist.index], 
                         y=section_dist.values,
@@ -543,30 +756,103 @@ def main():
         
         # 教室使用情况
         st.markdown("### 🏫 教室使用频率")
-        classroom_dist = course_df['教室'].value_counts().head(10)
+        classroom_dist = course_df['教室'].value_counts()
         
-        fig = px.treemap(values=classroom_dist.values, 
-                        names=classroom_dist.index,
-                        title="教室使用频率TOP10")
+        fig = treemap_chart(classroom_dist, "教室使用频率TOP10")
         st.plotly_chart(fig, use_container_width=True)
         
+        # 教室很多时，用分箱分布和排名曲线展示全部教室（数据量不随教室数增长）
+        if len(classroom_dist) > TOP_N:
+            col1, col2 = st.columns(2)
+            with col1:
+                fig = binned_bar_chart(classroom_dist, "教室使用次数分布", "使用次数", "教室数量")
+                st.plotly_chart(fig, use_container_width=True)
+            with col2:
+                fig = rank_chart(classroom_dist, "全部教室使用次数排名", "排名", "使用次数")
+                st.plotly_chart(fig, use_container_width=True)
+        
+        # 教室使用率热力图（任意两个维度，可按教室、周次筛选）
+        st.markdown("### 🔥 教室使用率热力图")
+        cube = get_utilization_cube(course_df)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            heat_rows = st.selectbox("行", AXES, index=AXES.index("星期"), key="heat_rows")
+        with col2:
+            heat_cols = st.selectbox("列", [axis for axis in AXES if axis != heat_rows], key="heat_cols")
+        with col3:
+            heat_room = st.selectbox("教室", ["全部教室"] + cube.rooms, key="heat_room")
+        with col4:
+            heat_week = st.selectbox("周次", ["全学期"] + list(range(1, TERM_WEEKS + 1)), key="heat_week",
+                                     format_func=lambda week: week if week == "全学期" else f"第{week}周")
+        
+        heat_filters = {}
+        if heat_room != "全部教室":
+            heat_filters["教室"] = heat_room
+        if heat_week != "全学期":
+            heat_filters["周次"] = heat_week
+        heatmap = cube.slice(heat_rows, heat_cols, heat_filters, rate=True)
+        # 教室很多时只显示使用率最高的教室
+        if "教室" in (heat_rows, heat_cols) and "教室" not in heat_filters:
+            busiest = cube.busiest_rooms(MAX_HEATMAP_ROOMS)
+            heatmap = heatmap.loc[busiest] if heat_rows == "教室" else heatmap[busiest]
+        if cube.rooms:
+            fig = px.imshow(heatmap, labels={'x': heat_cols, 'y': heat_rows, 'color': '使用率'},
+                            color_continuous_scale='YlOrRd', zmin=0, zmax=1, aspect='auto')
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # 教室冲突检测
+        st.markdown("### ⚠️ 教室冲突检测")
+        conflicts = cached_room_conflicts(course_df[SLOT_COLUMNS + ['周次', '课程名']])
+        if len(conflicts) > 0:
+            st.metric("冲突数量", len(conflicts))
+            st.error(f"发现 {len(conflicts)} 处教室重复占用，涉及 {conflicts['教室'].nunique()} 间教室")
+            st.dataframe(conflicts, use_container_width=True)
+        else:
+            st.success("✅ 未发现教室冲突")
+        
         # 准备事项分析
         if '准备项关键词' in course_df.columns:
             st.markdown("### 📋 准备事项统计")
             
             # 统计所有准备关键词
-            all_preps = []
-            for prep_list in course_df['准备项关键词']:
-                if isinstance(prep_list, list):
-                    all_preps.extend(prep_list)
+            prep_count = keyword_counts(course_df['准备项关键词'])
             
-            if all_preps:
-                prep_count = pd.Series(all_preps).value_counts()
-                
-                fig = px.pie(values=prep_count.values, 
-                            names=prep_count.index,
-                            title="准备事项分布")
+            if len(prep_count) > 0:
+                fig = pie_chart(prep_count, "准备事项分布")
                 st.plotly_chart(fig, use_container_width=True)
 
+    with tab5:
+        if 'course_df' not in st.session_state:
+            st.info("👆 请先上传课程表")
+            return
+        
+        st.markdown('<div class="step-card">', unsafe_allow_html=True)
+        st.subheader("🏫 空教室查询")
+        st.markdown("按周次、星期、节次查询当前课程表中没有被占用的教室")
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        occupancy = get_occupancy_index(st.session_state.course_df)
+        now = datetime.datetime.now()
+        now_section = current_section(now)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            query_week = st.number_input("周次", min_value=1, max_value=TERM_WEEKS, value=1, step=1, key="free_week")
+        with col2:
+            query_weekday = st.selectbox("星期", range(7), index=now.weekday(),
+                                         format_func=lambda day: WEEKDAY_LABELS[day], key="free_weekday")
+        with col3:
+            query_section = st.selectbox("节次", range(len(SECTIONS)),
+                                         index=SECTIONS.index(now_section) if now_section else 0,
+                                         format_func=lambda i: f"第{SECTIONS[i]}节（{CLASS_TIME_MAP[SECTIONS[i]]}）",
+                                         key="free_section")
+        
+        free = occupancy.free_rooms(int(query_week), query_weekday, query_section)
+        st.metric("空闲教室", f"{len(free)} / {len(occupancy.rooms)}")
+        if free:
+            st.dataframe(pd.DataFrame({"空闲教室": free}), use_container_width=True)
+        else:
+            st.warning("该时段没有空闲教室")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
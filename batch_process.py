@@ -0,0 +1,186 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from columnar_cache import text_object_columns
+from ingest import PARSER_VERSION, REQUIRED_COLUMNS, WEEKDAY_CODE, WEEKDAY_LABELS, canonicalize
+from keywords import CHANGE_COLUMN, PREPARE_COLUMN, parse_keywords
+from workbook_ingest import SHEET_ERRORS, read_workbook, sheet_names
+
+# ---------------------- 批量预处理课程表 ----------------------
+# 支持的课程表扩展名
+TIMETABLE_EXTENSIONS = (".xlsx", ".csv")
+
+
+# 展开输入：目录（递归查找课程表）或通配符
+def collect_files(inputs, extensions=TIMETABLE_EXTENSIONS):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(
+                    os.path.join(root, name) for name in names
+                    if name.lower().endswith(extensions) and not name.startswith("~$")
+                )
+        else:
+            files.extend(path for path in glob.glob(item, recursive=True) if path.lower().endswith(extensions))
+    return sorted(set(files))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# 输出文件名：保留输入的相对目录结构和扩展名（如 a/y.xlsx -> a/y.xlsx.parquet），
+# 避免不同院系的同名文件、同一目录下的 y.xlsx 与 y.csv 互相覆盖
+def output_stem(path, output_dir, base_dir):
+    relative = os.path.relpath(os.path.abspath(path), base_dir)
+    return os.path.join(output_dir, relative)
+
+
+# 已完成的文件（摘要存在且源文件哈希、解析版本一致）可以跳过，用于中断后续跑
+def is_done(stem, sha256):
+    try:
+        with open(f"{stem}.json", encoding="utf-8") as fp:
+            summary = json.load(fp)
+    except (OSError, ValueError):
+        return False
+    return (
+        summary.get("sha256") == sha256
+        and summary.get("parser_version") == PARSER_VERSION
+        and summary.get("status") == "ok"
+    )
+
+
+# 读取、校验并解析单个课程表（多工作表的工作簿在本进程内逐表解析）
+def _load(path):
+    if path.lower().endswith(".csv"):
+        raw = pd.read_csv(path)
+    elif len(sheet_names(path)) > 1:
+        return read_workbook(path, max_workers=1)
+    else:
+        raw = pd.read_excel(path)
+    missing = [col for col in REQUIRED_COLUMNS if col not in raw.columns]
+    if missing:
+        raise ValueError(f"缺少必需字段：{', '.join(missing)}")
+    return parse_keywords(canonicalize(raw))
+
+
+def _summary(path, sha256, course_df, elapsed):
+    weekday_counts = course_df[WEEKDAY_CODE].value_counts().sort_index()
+    changes = course_df[CHANGE_COLUMN].map(lambda kws: bool(kws) and kws != ["无调课信息"])
+    return {
+        "source": path,
+        "sha256": sha256,
+        "parser_version": PARSER_VERSION,
+        "status": "ok",
+        "rows": int(len(course_df)),
+        "courses": int(course_df["课程名"].nunique()),
+        "classrooms": int(course_df["教室"].nunique()),
+        "weekday_counts": {WEEKDAY_LABELS[int(code) - 1]: int(n) for code, n in weekday_counts.items()},
+        "changes": int(changes.sum()),
+        "sheet_errors": course_df.attrs.get(SHEET_ERRORS, {}),
+        "elapsed_seconds": round(elapsed, 3),
+    }
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        json.dump(data, fp, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# 处理单个文件：先写 Parquet，最后写摘要（摘要即完成标记）
+def process_file(path, stem, sha256):
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(stem) or ".", exist_ok=True)
+    try:
+        course_df = _load(path)
+        parquet_df = text_object_columns(course_df.copy(), exclude=(PREPARE_COLUMN, CHANGE_COLUMN))
+        parquet_df.attrs = {}
+        tmp_path = f"{stem}.parquet.tmp"
+        parquet_df.to_parquet(tmp_path, index=False, engine="pyarrow")
+        os.replace(tmp_path, f"{stem}.parquet")
+        summary = _summary(path, sha256, course_df, time.perf_counter() - start)
+    except Exception as exc:
+        summary = {
+            "source": path,
+            "sha256": sha256,
+            "parser_version": PARSER_VERSION,
+            "status": "error",
+            "error": f"{type(exc).__name__}: {exc}",
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+        }
+    _write_json(f"{stem}.json", summary)
+    return summary
+
+
+# 批量处理：跳过已完成的文件，其余分给进程池并按完成顺序输出进度
+def run_batch(files, output_dir, workers=None, force=False, base_dir=None, log=print):
+    base_dir = base_dir or os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files] or ["."])
+    pending = []
+    skipped = 0
+    for path in files:
+        stem = output_stem(path, output_dir, base_dir)
+        sha256 = file_sha256(path)
+        if not force and is_done(stem, sha256):
+            skipped += 1
+            continue
+        pending.append((path, stem, sha256))
+
+    if skipped:
+        log(f"⏭️ 跳过 {skipped} 个已处理的文件")
+
+    results = []
+    if not pending:
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_file, *task): task[0] for task in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            summary = future.result()
+            results.append(summary)
+            if summary["status"] == "ok":
+                log(f"[{done}/{len(pending)}] ✅ {summary['source']}（{summary['rows']} 行，{summary['elapsed_seconds']}s）")
+            else:
+                log(f"[{done}/{len(pending)}] ❌ {summary['source']}：{summary['error']}")
+    return results
+
+
+# ---------------------- 命令行入口 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量校验并解析课程表，输出 Parquet 与 JSON 摘要（可中断后续跑）")
+    parser.add_argument("inputs", nargs="+", help="课程表目录或通配符（如 data/**/*.xlsx）")
+    parser.add_argument("--output-dir", required=True, help="输出目录")
+    parser.add_argument("--workers", type=int, help="进程数（默认使用全部CPU核）")
+    parser.add_argument("--force", action="store_true", help="忽略已有结果，全部重新处理")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.inputs)
+    if not files:
+        print("未找到课程表文件（.xlsx / .csv）")
+        return 1
+    base_dir = None
+    if len(args.inputs) == 1 and os.path.isdir(args.inputs[0]):
+        base_dir = os.path.abspath(args.inputs[0])
+    print(f"共 {len(files)} 个课程表文件")
+
+    results = run_batch(files, args.output_dir, args.workers, args.force, base_dir)
+    failed = sum(1 for summary in results if summary["status"] != "ok")
+    print(f"完成：处理 {len(results)} 个，失败 {failed} 个")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
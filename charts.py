@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------- 统计图表（高基数安全） ----------------------
+# 饼图/树图最多显示的类别数，其余合并为"其他"
+TOP_N = 10
+OTHER_LABEL = "其他"
+
+# 单个图表序列化后的大小上限（字节），超出时减少类别/点数后重新生成
+FIGURE_BUDGET_BYTES = 100 * 1024
+
+# 散点类图表超过该点数时改用 WebGL 渲染，且最多保留 MAX_POINTS 个点
+WEBGL_POINT_THRESHOLD = 1000
+MAX_POINTS = 2000
+
+# 次数分箱的边界（1、2、5 递增），如 1次、2-4次、5-9次、10-19次……
+_BIN_STEPS = (1, 2, 5)
+
+
+# 计数取前 n 项，其余合并为一项"其他"（总数不变）
+def top_n_counts(counts, n=TOP_N, other_label=OTHER_LABEL):
+    counts = counts.sort_values(ascending=False)
+    if len(counts) <= n:
+        return counts
+    top = counts.iloc[:n].copy()
+    top[other_label] = counts.iloc[n:].sum()
+    return top
+
+
+# 关键词列表列的计数（展开后一次 value_counts，不逐行循环）
+def keyword_counts(keyword_lists, exclude=()):
+    exploded = keyword_lists[keyword_lists.map(lambda keywords: isinstance(keywords, list))].explode().dropna()
+    if exclude:
+        exploded = exploded[~exploded.isin(exclude)]
+    return exploded.value_counts()
+
+
+# 计数按 1/2/5 递增的区间分箱，返回 {"1次": 类别数, "2-4次": 类别数, ...}（如每间教室的使用次数分布）
+def binned_counts(counts):
+    if len(counts) == 0:
+        return pd.Series(dtype=np.int64)
+    edges = []
+    scale = 1
+    while not edges or edges[-1] <= counts.max():
+        edges.extend(step * scale for step in _BIN_STEPS)
+        scale *= 10
+    labels = [
+        f"{low}次" if high - low == 1 else f"{low}-{high - 1}次"
+        for low, high in zip(edges[:-1], edges[1:])
+    ]
+    binned = pd.cut(counts, bins=edges, labels=labels, right=False)
+    result = binned.value_counts().reindex(labels, fill_value=0)
+    return result.loc[: result[result > 0].index[-1]] if (result > 0).any() else result
+
+
+# 图表序列化后的大小（即发送到浏览器的数据量）
+def figure_bytes(fig):
+    return len(fig.to_json().encode("utf-8"))
+
+
+# 按类别数从多到少尝试生成图表，直到大小不超过预算
+def _within_budget(build, n, budget):
+    fig = build(n)
+    while n > 1 and figure_bytes(fig) > budget:
+        n //= 2
+        fig = build(n)
+    return fig
+
+
+# 前 n 类 + "其他" 的饼图
+def pie_chart(counts, title, n=TOP_N, budget=FIGURE_BUDGET_BYTES):
+    import plotly.express as px
+
+    def build(n):
+        top = top_n_counts(counts, n)
+        return px.pie(values=top.values, names=top.index, title=title)
+
+    return _within_budget(build, n, budget)
+
+
+# 前 n 类 + "其他" 的树图
+def treemap_chart(counts, title, n=TOP_N, budget=FIGURE_BUDGET_BYTES):
+    import plotly.express as px
+
+    def build(n):
+        top = top_n_counts(counts, n)
+        return px.treemap(values=top.values, names=top.index, title=title)
+
+    return _within_budget(build, n, budget)
+
+
+# 分箱后的柱状图（类别再多，柱子数也只随最大次数的数量级增长）
+def binned_bar_chart(counts, title, x_label, y_label):
+    import plotly.express as px
+
+    bins = binned_counts(counts)
+    return px.bar(x=bins.index.astype(str), y=bins.values, title=title, labels={"x": x_label, "y": y_label})
+
+
+# 排名-次数曲线（如全部教室按使用次数排序）：点多时改用 WebGL，并均匀抽样到 MAX_POINTS 个点
+def rank_chart(counts, title, x_label, y_label, max_points=MAX_POINTS, budget=FIGURE_BUDGET_BYTES):
+    import plotly.graph_objects as go
+
+    counts = counts.sort_values(ascending=False)
+
+    def build(points):
+        ranks = np.unique(np.linspace(0, len(counts) - 1, min(points, len(counts))).astype(int))
+        trace = go.Scattergl if len(counts) > WEBGL_POINT_THRESHOLD else go.Scatter
+        fig = go.Figure(trace(
+            x=ranks + 1,
+            y=counts.to_numpy()[ranks],
+            text=counts.index.to_numpy()[ranks],
+            mode="lines+markers" if len(ranks) <= 200 else "lines",
+            hovertemplate="%{text}<br>第%{x}名：%{y}<extra></extra>",
+        ))
+        fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label)
+        return fig
+
+    return _within_budget(build, max_points, budget) if len(counts) else go.Figure()
@@ -0,0 +1,164 @@
+import argparse
+import hashlib
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ingest import CANONICAL_COLUMNS, PARSER_VERSION, REQUIRED_COLUMNS, canonicalize, map_unique, parse_weeks
+from keywords import (
+    CHANGE_COLUMN,
+    CHANGE_VOCABULARY,
+    PREPARE_COLUMN,
+    PREPARE_VOCABULARY,
+    keyword_mask,
+    mask_keywords,
+    parse_keywords,
+)
+from workbook_ingest import is_multi_sheet, read_workbook_bytes
+
+# ---------------------- 列式磁盘缓存（Arrow IPC / Feather） ----------------------
+# 缓存目录（可用环境变量 KCB_CACHE_DIR 覆盖）
+CACHE_DIR = os.environ.get("KCB_CACHE_DIR", ".kcb_cache")
+
+# 缓存中额外保存的预计算列
+WEEK_MASK_COLUMN = "周次位图"
+PREPARE_MASK_COLUMN = "准备项掩码"
+CHANGE_MASK_COLUMN = "调课掩码"
+
+# 程序内部使用的规范化列（导出解析结果时去掉）
+INTERNAL_COLUMNS = CANONICAL_COLUMNS + [WEEK_MASK_COLUMN]
+
+# 解析后新增的列（预览原始课程表时隐藏）
+DERIVED_COLUMNS = INTERNAL_COLUMNS + [PREPARE_COLUMN, CHANGE_COLUMN]
+
+
+# 缓存键：源文件内容哈希 + 解析版本，文件内容或解析规则变化都会换一个键
+def cache_key(data):
+    return f"{hashlib.sha256(data).hexdigest()}-v{PARSER_VERSION}"
+
+
+def cache_path(key, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f"{key}.arrow")
+
+
+# 解析结果 -> 可列式存储的表：关键词列表换成位掩码，周次换成位图
+def to_columnar(course_df):
+    columnar = course_df.drop(columns=[PREPARE_COLUMN, CHANGE_COLUMN])
+    columnar[WEEK_MASK_COLUMN] = map_unique(course_df["周次"], parse_weeks).astype(np.int32)
+    columnar[PREPARE_MASK_COLUMN] = course_df[PREPARE_COLUMN].map(
+        lambda keywords: keyword_mask(keywords, PREPARE_VOCABULARY)).astype(np.int32)
+    columnar[CHANGE_MASK_COLUMN] = course_df[CHANGE_COLUMN].map(
+        lambda keywords: keyword_mask(keywords, CHANGE_VOCABULARY)).astype(np.int32)
+    return text_object_columns(columnar)
+
+
+# 混合类型的对象列（如 节次 同时有 3 和 "3-4"）统一存为文本，Arrow/Parquet 才能写出
+def text_object_columns(df, exclude=()):
+    for col in df.columns:
+        if df[col].dtype == object and col not in exclude:
+            df[col] = df[col].map(lambda value: None if pd.isna(value) else str(value))
+    return df
+
+
+# 列式表 -> 解析结果：按位掩码还原关键词列表（不重复的掩码只还原一次）
+def from_columnar(columnar):
+    course_df = columnar.drop(columns=[PREPARE_MASK_COLUMN, CHANGE_MASK_COLUMN])
+    course_df[PREPARE_COLUMN] = map_unique(
+        columnar[PREPARE_MASK_COLUMN], lambda mask: mask_keywords(mask, PREPARE_VOCABULARY))
+    course_df[CHANGE_COLUMN] = map_unique(
+        columnar[CHANGE_MASK_COLUMN], lambda mask: mask_keywords(mask, CHANGE_VOCABULARY))
+    return course_df
+
+
+# 写入缓存（不压缩，读取时不需要解压；先写临时文件再改名，读者不会看到半个文件）
+def write_cache(course_df, key, cache_dir=None):
+    import pyarrow as pa
+
+    path = cache_path(key, cache_dir)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    table = pa.Table.from_pandas(to_columnar(course_df), preserve_index=False)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+# 打开缓存，返回 Arrow 表（内存映射读取，只在需要 Arrow 表本身时使用，如命令行或统计）
+def open_cache(key, cache_dir=None):
+    import pyarrow as pa
+
+    path = cache_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+# 读取缓存为解析结果 DataFrame，未命中返回 None。
+# 这是磁盘缓存：省去重新读取 Excel 和解析关键词的时间，但转换为 pandas 时文本列和含空值的整数列都会复制，
+# 每次读取得到的是一份独立的 DataFrame，不与其他会话或进程共享内存（同一份课程表在进程内由上层缓存复用）
+def read_cache(key, cache_dir=None):
+    table = open_cache(key, cache_dir)
+    if table is None:
+        return None
+    return from_columnar(table.to_pandas(split_blocks=True))
+
+
+# 读取并解析课程表，优先使用磁盘缓存
+# data 为文件字节，name 用于判断 xlsx / csv；多工作表的工作簿按工作表并行解析
+# 缺少必需字段（或所有工作表都解析失败）时返回原始表，不写缓存
+# progress(比例, 阶段) 用于向后台任务汇报进度
+def load_timetable_cached(data, name, cache_dir=None, progress=None):
+    report = progress or (lambda fraction, stage: None)
+    report(0.05, "检查缓存")
+    key = cache_key(data)
+    cached = read_cache(key, cache_dir)
+    if cached is not None:
+        return cached
+
+    report(0.1, "读取文件")
+    if name.lower().endswith(".csv"):
+        raw = pd.read_csv(io.BytesIO(data))
+    elif is_multi_sheet(data):
+        report(0.2, "并行解析工作表")
+        course_df = read_workbook_bytes(data)
+        if course_df.empty:
+            return course_df
+        report(0.8, "写入缓存")
+        write_cache(course_df, key, cache_dir)
+        return read_cache(key, cache_dir)
+    else:
+        raw = pd.read_excel(io.BytesIO(data))
+    if any(col not in raw.columns for col in REQUIRED_COLUMNS):
+        return raw
+
+    report(0.6, "解析关键词")
+    course_df = parse_keywords(canonicalize(raw))
+    report(0.8, "写入缓存")
+    write_cache(course_df, key, cache_dir)
+    return read_cache(key, cache_dir)
+
+
+# ---------------------- 命令行预热缓存 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="预先解析课程表并写入列式缓存，重启后可直接加载")
+    parser.add_argument("files", nargs="+", help="课程表文件（.xlsx / .csv）")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="缓存目录")
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        with open(path, "rb") as fp:
+            data = fp.read()
+        key = cache_key(data)
+        hit = os.path.exists(cache_path(key, args.cache_dir))
+        course_df = load_timetable_cached(data, os.path.basename(path), args.cache_dir)
+        print(f"{'命中' if hit else '已写入'} {path} -> {key[:12]}（{len(course_df)} 行）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import argparse
+import sys
+
+import pandas as pd
+
+from ingest import (
+    SECTION_CODE,
+    SECTION_END_CODE,
+    WEEKDAY_CODE,
+    WEEKDAY_LABELS,
+    canonicalize,
+    format_weeks,
+    map_unique,
+    parse_weeks,
+    read_timetable,
+)
+
+# ---------------------- 教室冲突检测 ----------------------
+# 冲突判定的时段字段：同一教室、同一星期、节次区间重叠（使用规范化阶段生成的整数列）
+SLOT_COLUMNS = ["教室", WEEKDAY_CODE, SECTION_CODE, SECTION_END_CODE]
+
+# 冲突报告字段
+CONFLICT_COLUMNS = ["教室", "星期", "节次", "课程A", "课程B", "行号A", "行号B", "冲突周次"]
+
+# 视为"没有教室"的占位值，不参与冲突检测
+EMPTY_ROOM_VALUES = {"", "-", "nan", "无", "待定"}
+
+
+# 重叠的节次区间写成 "3" 或 "3-4"
+def _section_label(first, last):
+    return str(first) if first == last else f"{first}-{last}"
+
+
+# 检测教室重复占用，每对冲突的行只报告一次（连堂课不按节拆开）
+# 先按 (教室, 星期) 哈希筛出同一天有多门课的教室，排序后顺序扫描：只和同组中末节不早于当前首节的行比较节次区间，
+# 节次重叠时再用周次位图求交集，整体接近线性
+def detect_room_conflicts(course_df):
+    if not all(col in course_df.columns for col in SLOT_COLUMNS):
+        course_df = canonicalize(course_df)
+    slots = pd.DataFrame({
+        "教室": course_df["教室"].astype(str).str.strip(),
+        "星期": course_df[WEEKDAY_CODE],
+        "首节": course_df[SECTION_CODE],
+        "末节": course_df[SECTION_END_CODE],
+    }, index=course_df.index)
+    slots = slots[~slots["教室"].isin(EMPTY_ROOM_VALUES) & slots["星期"].notna() & slots["首节"].notna()]
+
+    # 只保留同一教室同一天有多门课的行（哈希去重，O(n)）
+    slots = slots[slots.duplicated(["教室", "星期"], keep=False)]
+    if slots.empty:
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+
+    slots = slots.astype({"星期": int, "首节": int, "末节": int}).sort_values(["教室", "星期", "首节"], kind="stable")
+    week_masks = map_unique(course_df.loc[slots.index, "周次"], parse_weeks)
+    course_names = course_df.loc[slots.index, "课程名"]
+
+    conflicts = []
+    active = []
+    current = None
+    for row, classroom, weekday, first, last, mask in zip(
+        slots.index, slots["教室"], slots["星期"], slots["首节"], slots["末节"], week_masks[slots.index],
+    ):
+        if (classroom, weekday) != current:
+            current = (classroom, weekday)
+            active = []
+        else:
+            active = [item for item in active if item[2] >= first]
+        for prev_row, prev_first, prev_last, prev_mask in active:
+            overlap = mask & prev_mask
+            if overlap:
+                conflicts.append({
+                    "教室": classroom,
+                    "星期": WEEKDAY_LABELS[weekday - 1],
+                    "节次": _section_label(max(first, prev_first), min(last, prev_last)),
+                    "课程A": course_names[prev_row],
+                    "课程B": course_names[row],
+                    "行号A": prev_row,
+                    "行号B": row,
+                    "冲突周次": format_weeks(overlap),
+                })
+        active.append((row, first, last, mask))
+
+    return pd.DataFrame(conflicts, columns=CONFLICT_COLUMNS)
+
+
+# 生成文字版冲突报告
+def format_conflict_report(conflicts):
+    if conflicts.empty:
+        return "✅ 未发现教室冲突"
+    lines = [f"⚠️ 共发现 {len(conflicts)} 处教室冲突，涉及 {conflicts['教室'].nunique()} 间教室"]
+    for _, conflict in conflicts.iterrows():
+        lines.append(
+            f"- {conflict['教室']} {conflict['星期']} 第{conflict['节次']}节 | "
+            f"{conflict['课程A']}（#{conflict['行号A']}） ↔ {conflict['课程B']}（#{conflict['行号B']}） | "
+            f"{conflict['冲突周次']}"
+        )
+    return "\n".join(lines)
+
+
+# ---------------------- 命令行报告 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检测课程表中的教室冲突（同一教室同一时段被重复安排）")
+    parser.add_argument("files", nargs="+", help="课程表文件（.xlsx / .csv），多个文件会合并检测")
+    parser.add_argument("--csv", help="将冲突明细另存为CSV文件")
+    args = parser.parse_args(argv)
+
+    course_df = pd.concat([read_timetable(path) for path in args.files], ignore_index=True)
+    conflicts = detect_room_conflicts(course_df)
+    print(format_conflict_report(conflicts))
+
+    if args.csv:
+        conflicts.to_csv(args.csv, index=False, encoding="utf-8-sig")
+    return 1 if len(conflicts) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import io
+import tempfile
+from functools import lru_cache
+
+import pandas as pd
+
+# ---------------------- Excel 模板与导出 ----------------------
+# 示例课程表
+SAMPLE_TIMETABLE = {
+    '课程名': ['高等数学', '大学英语', '计算机基础', '线性代数', '概率论'],
+    '周次': ['1-16周', '1-16周', '1-16周', '1-16周', '1-16周'],
+    '星期': ['星期三', '星期三', '星期四', '星期五', '星期五'],
+    '节次': [3, 5, 2, 1, 3],
+    '教室': ['3教201', '语音室1', '机房5', '2教301', '1教102'],
+    '课前准备': [
+        '带微积分习题集+完成P20作业',
+        '带英语课本+听力耳机',
+        '带U盘+完成实验报告1',
+        '带教材+练习本',
+        '带计算器+完成课后题'
+    ],
+    '备注': [
+        '-',
+        '本周调至星期五第6节',
+        '-',
+        '考试周停课',
+        '-'
+    ]
+}
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# 超过该行数时改用只写模式逐行写出
+STREAMING_ROW_THRESHOLD = 5000
+
+
+# DataFrame 写入内存中的 xlsx，返回字节
+def dataframe_to_excel_bytes(df, sheet_name="课程表"):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, sheet_name=sheet_name, engine='openpyxl')
+    return buffer.getvalue()
+
+
+# 示例课程表字节（静态模板，只生成一次）
+@lru_cache(maxsize=1)
+def sample_timetable_bytes():
+    return dataframe_to_excel_bytes(pd.DataFrame(SAMPLE_TIMETABLE))
+
+
+# 单元格取值：关键词列表拼成文本，缺失值留空
+def _cell_value(value):
+    if isinstance(value, (list, tuple)):
+        return "、".join(str(item) for item in value)
+    if value is None or pd.isna(value) is True:
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# 以只写模式逐行写出（openpyxl write_only），行数据不会在内存中堆积成整张工作表
+def write_excel_streaming(df, target, sheet_name="课程表", chunk_size=5000):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append([str(col) for col in df.columns])
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        for row in chunk.itertuples(index=False, name=None):
+            sheet.append([_cell_value(value) for value in row])
+    workbook.save(target)
+
+
+# 导出解析结果：小表直接写入内存，大表先流式写入临时文件再读出
+def export_excel_bytes(df, sheet_name="课程表"):
+    if len(df) < STREAMING_ROW_THRESHOLD:
+        return dataframe_to_excel_bytes(df.apply(lambda col: col.map(_cell_value)), sheet_name)
+    with tempfile.TemporaryFile() as tmp:
+        write_excel_streaming(df, tmp, sheet_name)
+        tmp.seek(0)
+        return tmp.read()
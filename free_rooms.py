@@ -0,0 +1,183 @@
+import argparse
+import datetime
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from conflict_detector import EMPTY_ROOM_VALUES
+from ingest import (
+    CLASS_DURATION,
+    CLASS_TIME_MAP,
+    TERM_WEEKS,
+    WEEKDAY_LABELS,
+    map_unique,
+    parse_weeks,
+    read_timetable,
+    section_code,
+    section_span,
+    time_to_minutes,
+    week_list,
+    weekday_index,
+)
+
+# ---------------------- 空教室查询 ----------------------
+# 占用索引使用的字段
+OCCUPANCY_COLUMNS = ["教室", "星期", "节次", "周次"]
+
+# 节次编号（按作息表顺序）
+SECTIONS = list(CLASS_TIME_MAP.keys())
+_SECTION_INDEX = {section: i for i, section in enumerate(SECTIONS)}
+
+# 节次转为作息表下标，无法识别返回 None
+def section_index(value):
+    return _SECTION_INDEX.get(str(section_code(value)))
+
+
+# 节次（含连堂 "3-4"）转为作息表下标区间 (首, 末)，无法识别返回 None
+def section_range(value):
+    span = section_span(value)
+    if span is None:
+        return None
+    first = _SECTION_INDEX.get(str(span[0]))
+    last = _SECTION_INDEX.get(str(span[1]))
+    if first is None or last is None:
+        return None
+    return first, last
+
+
+# 当前时刻所在（或即将开始）的节次，课后返回 None
+def current_section(now=None):
+    now = now or datetime.datetime.now()
+    minutes = now.hour * 60 + now.minute
+    for section in SECTIONS:
+        if minutes < time_to_minutes(CLASS_TIME_MAP[section]) + CLASS_DURATION:
+            return section
+    return None
+
+
+# 教室占用索引：每间教室一个 周次 × 星期 × 节次 的占用计数数组
+# 计数而不是布尔值，这样课程表变化时可以只对新增/删除的行做增减；
+# rooms 只包含当前课程表中出现的教室，课程全部删除的教室在更新时移除
+class OccupancyIndex:
+    def __init__(self):
+        self.rooms = []
+        self._room_index = {}
+        self.counts = np.zeros((0, TERM_WEEKS, 7, len(SECTIONS)), dtype=np.int16)
+        self._slots = Counter()
+        self._room_slots = Counter()
+
+    # 教室下标，新教室会扩展数组
+    def _room(self, classroom):
+        idx = self._room_index.get(classroom)
+        if idx is None:
+            idx = len(self.rooms)
+            self.rooms.append(classroom)
+            self._room_index[classroom] = idx
+            if idx >= len(self.counts):
+                grown = np.zeros((max(16, 2 * len(self.counts)),) + self.counts.shape[1:], dtype=np.int16)
+                grown[:len(self.counts)] = self.counts
+                self.counts = grown
+        return idx
+
+    # 课程表 -> 时段计数（教室, 星期, 节次区间, 周次位图）
+    @staticmethod
+    def _slot_counter(course_df):
+        slots = pd.DataFrame({
+            "教室": course_df["教室"].astype(str).str.strip(),
+            "星期": map_unique(course_df["星期"], weekday_index),
+            "节次": map_unique(course_df["节次"], section_range),
+            "周次": map_unique(course_df["周次"], parse_weeks),
+        })
+        slots = slots[~slots["教室"].isin(EMPTY_ROOM_VALUES) & slots["星期"].notna() & slots["节次"].notna()]
+        return Counter(zip(
+            slots["教室"].tolist(),
+            slots["星期"].astype(int).tolist(),
+            slots["节次"].tolist(),
+            slots["周次"].tolist(),
+        ))
+
+    def _apply(self, slot, delta):
+        classroom, weekday, (first, last), mask = slot
+        room = self._room(classroom)
+        weeks = [week - 1 for week in week_list(mask)]
+        self.counts[room, weeks, weekday, first:last + 1] += delta
+        self._room_slots[classroom] += delta
+
+    # 移除已没有任何课程的教室，其余教室保持原有顺序
+    def _prune(self):
+        keep = [i for i, classroom in enumerate(self.rooms) if self._room_slots[classroom] > 0]
+        if len(keep) == len(self.rooms):
+            return
+        for classroom in self.rooms:
+            if self._room_slots[classroom] <= 0:
+                del self._room_slots[classroom]
+        pruned = np.zeros_like(self.counts)
+        pruned[:len(keep)] = self.counts[keep]
+        self.counts = pruned
+        self.rooms = [self.rooms[i] for i in keep]
+        self._room_index = {classroom: i for i, classroom in enumerate(self.rooms)}
+
+    # 按新课程表增量更新：只处理新增和删除的时段
+    def update(self, course_df):
+        slots = self._slot_counter(course_df)
+        added = slots - self._slots
+        removed = self._slots - slots
+        for slot, n in added.items():
+            self._apply(slot, n)
+        for slot, n in removed.items():
+            self._apply(slot, -n)
+        self._slots = slots
+        if removed:
+            self._prune()
+        return len(added) + len(removed)
+
+    # 某周某天某节的空闲教室
+    def free_rooms(self, week, weekday, section):
+        if not 1 <= week <= TERM_WEEKS:
+            return []
+        occupied = self.counts[:len(self.rooms), week - 1, weekday, section]
+        return [self.rooms[i] for i in np.flatnonzero(occupied == 0)]
+
+    # 某周某天某节的占用教室
+    def occupied_rooms(self, week, weekday, section):
+        if not 1 <= week <= TERM_WEEKS:
+            return []
+        occupied = self.counts[:len(self.rooms), week - 1, weekday, section]
+        return [self.rooms[i] for i in np.flatnonzero(occupied > 0)]
+
+
+# 由课程表构建占用索引
+def build_occupancy_index(course_df):
+    index = OccupancyIndex()
+    index.update(course_df)
+    return index
+
+
+# ---------------------- 命令行查询 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询指定周次、星期、节次的空闲教室")
+    parser.add_argument("files", nargs="+", help="课程表文件（.xlsx / .csv），多个文件会合并查询")
+    parser.add_argument("--week", type=int, required=True, help="第几周")
+    parser.add_argument("--weekday", required=True, help="星期（如 星期三、周三、3）")
+    parser.add_argument("--section", required=True, help="节次（如 5）")
+    args = parser.parse_args(argv)
+
+    weekday = weekday_index(args.weekday)
+    section = section_index(args.section)
+    if weekday is None or section is None:
+        parser.error("无法识别的星期或节次")
+
+    course_df = pd.concat([read_timetable(path) for path in args.files], ignore_index=True)
+    index = build_occupancy_index(course_df)
+    rooms = index.free_rooms(args.week, weekday, section)
+
+    print(f"第{args.week}周 {WEEKDAY_LABELS[weekday]} 第{SECTIONS[section]}节：{len(rooms)} / {len(index.rooms)} 间教室空闲")
+    for classroom in rooms:
+        print(f"- {classroom}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import argparse
+import datetime
+import hashlib
+import os
+import re
+import sys
+import zipfile
+from collections import Counter
+
+import pandas as pd
+
+from ingest import parse_weeks, read_timetable, section_minutes, week_list, weekday_index
+
+# ---------------------- iCalendar (.ics) 导出 ----------------------
+# 日历时区（中国不实行夏令时，固定 +08:00）
+TIMEZONE = "Asia/Shanghai"
+
+_VTIMEZONE = [
+    "BEGIN:VTIMEZONE",
+    f"TZID:{TIMEZONE}",
+    "BEGIN:STANDARD",
+    "DTSTART:19700101T000000",
+    "TZOFFSETFROM:+0800",
+    "TZOFFSETTO:+0800",
+    "TZNAME:CST",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+# 备注中的调课写法，如 "本周调至星期五第6节"、"第8周改为周四第3节"
+_RESCHEDULE_RE = re.compile(
+    r"(?:调至|调到|改为|改到)(?:第(\d+)周)?((?:星期|周)[一二三四五六日天1-7])第?(\d+)节"
+)
+_WEEK_NO_RE = re.compile(r"第(\d+)周")
+
+
+# iCalendar 文本转义
+def _escape(text):
+    return (
+        str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+# 单元格文本：空值（None / NaN / pd.NA）返回空字符串，不写成 "nan"
+def _text(value):
+    if value is None or pd.isna(value) is True:
+        return ""
+    return str(value).strip()
+
+
+# 按 75 字节折行（不拆开多字节字符），每行以 CRLF 结尾
+def _fold(line):
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    start = 0
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode("utf-8"))
+        start = end
+        limit = 74  # 续行开头占一个空格
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _format_local(moment):
+    return moment.strftime("%Y%m%dT%H%M%S")
+
+
+# 第 week 周星期 weekday（0-6）节次 section 的上课起止时间
+def class_datetimes(term_start, week, weekday, section):
+    span = section_minutes(section)
+    if span is None:
+        return None
+    day = term_start + datetime.timedelta(weeks=week - 1, days=weekday)
+    midnight = datetime.datetime.combine(day, datetime.time())
+    return (
+        midnight + datetime.timedelta(minutes=span[0]),
+        midnight + datetime.timedelta(minutes=span[1]),
+    )
+
+
+# 今天是第几周（学期开始前为0或负数，由调用方判断是否越界）
+def current_week(term_start, today=None):
+    today = today or datetime.date.today()
+    return (today - term_start).days // 7 + 1
+
+
+# 解析备注中的调课信息：返回 (周次, 星期0-6, 节次)，周次为 None 表示整门课调整；无调课返回 None
+def parse_reschedule(note, term_start=None, today=None):
+    if note is None or (isinstance(note, float) and pd.isna(note)):
+        return None
+    text = str(note).replace(" ", "")
+    match = _RESCHEDULE_RE.search(text)
+    if not match:
+        return None
+    week, weekday_text, section = match.groups()
+    weekday = weekday_index(weekday_text)
+    if weekday is None:
+        return None
+    if not week:
+        before = _WEEK_NO_RE.search(text[:match.start()])
+        week = before.group(1) if before else None
+    if week:
+        week = int(week)
+    elif "本周" in text and term_start is not None:
+        week = current_week(term_start, today)
+    else:
+        week = None
+    return week, weekday, section
+
+
+# 同一日历中完全相同的课程行用序号区分 UID（第一行不加序号，已导入的日历 UID 不变）
+def _event_uid(course, source, occurrence):
+    key = "|".join(str(course.get(col, "")) for col in ("课程名", "周次", "星期", "节次", "教室")) + f"|{source}"
+    if occurrence:
+        key += f"|{occurrence}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest() + "@kcb"
+
+
+# 单门课程的事件行：一条每周重复的主事件 + 调课产生的例外事件（教室、课前准备为空时不写对应字段）
+def _course_events(course, term_start, stamp, today, uid):
+    weekday = weekday_index(course["星期"])
+    weeks = week_list(parse_weeks(course["周次"]))
+    if weekday is None or not weeks:
+        return
+    section = course["节次"]
+    reschedule = parse_reschedule(course.get("备注"), term_start, today)
+
+    # 整门课调整：直接改用新的星期/节次
+    moved = None
+    if reschedule is not None:
+        if reschedule[0] is None:
+            _, weekday, section = reschedule
+        elif reschedule[0] in weeks:
+            moved = reschedule
+
+    first = class_datetimes(term_start, weeks[0], weekday, section)
+    if first is None:
+        return
+
+    summary = _escape(_text(course["课程名"]))
+    location = _escape(_text(course.get("教室")))
+    description = _escape(_text(course.get("课前准备")))
+    note = _escape(_text(course.get("备注")))
+
+    week_set = set(weeks)
+    skipped = [week for week in range(weeks[0], weeks[-1] + 1) if week not in week_set]
+
+    yield "BEGIN:VEVENT"
+    yield f"UID:{uid}"
+    yield f"DTSTAMP:{stamp}"
+    yield f"DTSTART;TZID={TIMEZONE}:{_format_local(first[0])}"
+    yield f"DTEND;TZID={TIMEZONE}:{_format_local(first[1])}"
+    yield f"RRULE:FREQ=WEEKLY;COUNT={weeks[-1] - weeks[0] + 1}"
+    if skipped:
+        yield f"EXDATE;TZID={TIMEZONE}:" + ",".join(
+            _format_local(class_datetimes(term_start, week, weekday, section)[0]) for week in skipped
+        )
+    yield f"SUMMARY:{summary}"
+    if location:
+        yield f"LOCATION:{location}"
+    if description:
+        yield f"DESCRIPTION:{description}"
+    yield "END:VEVENT"
+
+    # 单次调课：用 RECURRENCE-ID 覆盖原来那一次
+    if moved is not None:
+        week, new_weekday, new_section = moved
+        original = class_datetimes(term_start, week, weekday, section)
+        target = class_datetimes(term_start, week, new_weekday, new_section)
+        if target is None:
+            return
+        yield "BEGIN:VEVENT"
+        yield f"UID:{uid}"
+        yield f"DTSTAMP:{stamp}"
+        yield f"RECURRENCE-ID;TZID={TIMEZONE}:{_format_local(original[0])}"
+        yield f"DTSTART;TZID={TIMEZONE}:{_format_local(target[0])}"
+        yield f"DTEND;TZID={TIMEZONE}:{_format_local(target[1])}"
+        yield f"SUMMARY:{summary}（调课）"
+        if location:
+            yield f"LOCATION:{location}"
+        if note:
+            yield f"DESCRIPTION:{note}"
+        yield "END:VEVENT"
+
+
+# 逐行生成一份日历（已折行、带 CRLF），不在内存中拼接整份文件
+def iter_calendar(course_df, term_start, name="课程表", source="", today=None):
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    header = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//KCB//课程表//ZH",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_escape(name)}",
+        f"X-WR-TIMEZONE:{TIMEZONE}",
+    ] + _VTIMEZONE
+    for line in header:
+        yield _fold(line)
+    occurrences = Counter()
+    for course in course_df.to_dict("records"):
+        uid = _event_uid(course, source, 0)
+        occurrences[uid] += 1
+        if occurrences[uid] > 1:
+            uid = _event_uid(course, source, occurrences[uid] - 1)
+        for line in _course_events(course, term_start, stamp, today, uid):
+            yield _fold(line)
+    yield _fold("END:VCALENDAR")
+
+
+# 写入单个 .ics 文件（文本流）
+def write_calendar(fp, course_df, term_start, name="课程表", source="", today=None):
+    for line in iter_calendar(course_df, term_start, name, source, today):
+        fp.write(line)
+
+
+# 生成单份日历的字节内容（用于页面下载）
+def calendar_bytes(course_df, term_start, name="课程表", today=None):
+    return "".join(iter_calendar(course_df, term_start, name, today=today)).encode("utf-8")
+
+
+# 批量写入 zip：calendars 为 (名称, 课程表) 的可迭代对象
+# 每份日历边生成边压缩写入，内存占用与日历数量无关
+def write_calendars_zip(target, calendars, term_start, today=None):
+    count = 0
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, course_df in calendars:
+            safe_name = re.sub(r'[\\/:*?"<>|]', "_", str(name)) or "课程表"
+            with archive.open(f"{safe_name}.ics", "w") as entry:
+                for line in iter_calendar(course_df, term_start, str(name), str(name), today):
+                    entry.write(line.encode("utf-8"))
+            count += 1
+    return count
+
+
+# ---------------------- 命令行批量导出 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="将课程表导出为 iCalendar (.ics) 日历")
+    parser.add_argument("files", nargs="+", help="课程表文件（.xlsx / .csv）")
+    parser.add_argument("--term-start", required=True, help="第1周星期一的日期，如 2026-09-07")
+    parser.add_argument("--group-by", help="按该字段拆分为多份日历（如 学生、班级）并打包为zip")
+    parser.add_argument("--output", required=True, help="输出文件（.ics，或按文件/分组拆分时为 .zip）")
+    args = parser.parse_args(argv)
+
+    term_start = datetime.date.fromisoformat(args.term_start)
+
+    if not args.output.lower().endswith(".zip"):
+        course_df = pd.concat([read_timetable(path) for path in args.files], ignore_index=True)
+        with open(args.output, "w", encoding="utf-8", newline="") as fp:
+            write_calendar(fp, course_df, term_start)
+        print(f"✅ 已导出 {len(course_df)} 门课程到 {args.output}")
+        return 0
+
+    # zip 输出：逐个文件读取，每个文件（或每个分组）一份日历
+    def calendars():
+        for path in args.files:
+            course_df = read_timetable(path)
+            base = os.path.splitext(os.path.basename(path))[0]
+            if args.group_by:
+                for group, group_df in course_df.groupby(args.group_by, sort=False):
+                    yield f"{base}_{group}", group_df
+            else:
+                yield base, course_df
+
+    count = write_calendars_zip(args.output, calendars(), term_start)
+    print(f"✅ 已导出 {count} 份日历到 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
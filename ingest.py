@@ -0,0 +1,226 @@
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+# ---------------------- 课程表读取与字段解析 ----------------------
+# 课程表必需字段
+REQUIRED_COLUMNS = ['课程名', '周次', '星期', '节次', '教室', '课前准备', '备注']
+
+# 解析逻辑版本（修改规范化/关键词解析规则后加1，使磁盘缓存失效）
+PARSER_VERSION = 2
+
+# 节次-上课时间映射（可按学校作息修改）
+CLASS_TIME_MAP = {
+    "1": "08:00", "2": "08:50", "3": "10:00", "4": "10:50",
+    "5": "14:00", "6": "14:50", "7": "16:00", "8": "16:50",
+    "9": "19:00", "10": "19:50", "11": "20:40"
+}
+
+# 每节课时长（分钟）
+CLASS_DURATION = 45
+
+# 一学期最多周数（周次位图的位数）
+TERM_WEEKS = 20
+
+# 全学期周次位图（第1周对应最低位）
+ALL_WEEKS_MASK = (1 << TERM_WEEKS) - 1
+
+# 单周 / 双周位图
+ODD_WEEKS_MASK = sum(1 << (week - 1) for week in range(1, TERM_WEEKS + 1, 2))
+EVEN_WEEKS_MASK = ALL_WEEKS_MASK ^ ODD_WEEKS_MASK
+
+# 星期显示名称（下标 0-6 对应周一到周日）
+WEEKDAY_LABELS = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
+
+# 规范化后的整数列：星期码 1-7（周一为1），节次码为节次序号
+WEEKDAY_CODE = "星期码"
+SECTION_CODE = "节次码"
+
+# 连堂课（如 "3-4节"）的最后一节，以及按作息表算出的上课起止时间（当天分钟数）
+SECTION_END_CODE = "末节码"
+START_MINUTE = "开始分钟"
+END_MINUTE = "结束分钟"
+CANONICAL_COLUMNS = [WEEKDAY_CODE, SECTION_CODE, SECTION_END_CODE, START_MINUTE, END_MINUTE]
+
+# 星期写法 -> 1-7，中文数字/阿拉伯数字/英文缩写都统一到这里
+_WEEKDAY_CODES = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "日": 7, "天": 7, "七": 7}
+for _i, _names in enumerate([
+    ("mon", "monday"), ("tue", "tues", "tuesday"), ("wed", "weds", "wednesday"),
+    ("thu", "thur", "thurs", "thursday"), ("fri", "friday"), ("sat", "saturday"), ("sun", "sunday"),
+]):
+    _WEEKDAY_CODES[str(_i + 1)] = _i + 1
+    for _name in _names:
+        _WEEKDAY_CODES[_name] = _i + 1
+
+# 节次写法，如 3、"3"、"3节"、"第3节"，以及连堂 "3-4"、"5-7节"、"第3至4节"
+_SECTION_RE = re.compile(r"^第?\s*(\d+)\s*(?:[-~—至到]\s*第?\s*(\d+))?\s*节?$")
+
+# 周次中的区间/单个周，如 "1-16"、"7"
+_WEEK_RANGE_RE = re.compile(r"(\d+)\s*(?:[-~至到]\s*(\d+))?")
+
+
+# 对列中的不重复值逐个求值后按编码回填，适合重复度高的列（周次、节次等）
+def map_unique(series, func):
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    values = pd.Series([func(value) for value in uniques], dtype=object)
+    return pd.Series(values.to_numpy()[codes], index=series.index)
+
+
+# 读取课程表文件（xlsx / csv），读入后即做规范化
+def read_timetable(path):
+    path = str(path)
+    if path.lower().endswith(".csv"):
+        return canonicalize(pd.read_csv(path))
+    return canonicalize(pd.read_excel(path))
+
+
+# 解析周次为位图：第w周对应第(w-1)位
+# 支持 "1-16周"、"1-8,10-16周"、"3,5,7周"、"1-16周(单)"、"双周"、7 等写法
+# 周次为空时视为全学期上课
+@lru_cache(maxsize=4096)
+def _parse_weeks_text(text):
+    text = text.replace("，", ",").replace("、", ",").replace(" ", "")
+    if text in ("", "-", "nan"):
+        return ALL_WEEKS_MASK
+
+    mask = 0
+    for start, end in _WEEK_RANGE_RE.findall(text):
+        start = int(start)
+        end = int(end) if end else start
+        if start > end:
+            start, end = end, start
+        for week in range(max(start, 1), min(end, TERM_WEEKS) + 1):
+            mask |= 1 << (week - 1)
+    if mask == 0:
+        mask = ALL_WEEKS_MASK
+
+    # 单双周过滤
+    if "单" in text:
+        mask &= ODD_WEEKS_MASK
+    elif "双" in text:
+        mask &= EVEN_WEEKS_MASK
+    return mask
+
+
+def parse_weeks(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ALL_WEEKS_MASK
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return _parse_weeks_text(str(value).strip())
+
+
+# 周次位图还原为周列表，如 0b101 -> [1, 3]
+def week_list(mask):
+    return [week for week in range(1, TERM_WEEKS + 1) if mask >> (week - 1) & 1]
+
+
+# 周列表压缩为可读文本，如 [1, 2, 3, 5] -> "1-3,5周"
+def format_weeks(mask):
+    weeks = week_list(mask)
+    if not weeks:
+        return ""
+    parts = []
+    start = prev = weeks[0]
+    for week in weeks[1:] + [None]:
+        if week is not None and week == prev + 1:
+            prev = week
+            continue
+        parts.append(f"{start}-{prev}" if start != prev else f"{start}")
+        if week is not None:
+            start = prev = week
+    return ",".join(parts) + "周"
+
+
+# 数值型单元格（Excel 常读成 3.0）转为整数，其余原样返回
+def _plain_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+@lru_cache(maxsize=1024)
+def _weekday_code_text(text):
+    text = text.strip().lower().rstrip(".")
+    for prefix in ("星期", "周", "礼拜"):
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+            break
+    return _WEEKDAY_CODES.get(text)
+
+
+# 星期写法转为 1-7（"星期三"、"周三"、"Wed"、3 -> 3），无法识别返回 None
+def weekday_code(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return _weekday_code_text(str(_plain_value(value)))
+
+
+# 星期写法转为 0-6（周一为0），无法识别返回 None
+def weekday_index(value):
+    code = weekday_code(value)
+    return None if code is None else code - 1
+
+
+@lru_cache(maxsize=1024)
+def _section_span_text(text):
+    match = _SECTION_RE.match(text.strip())
+    if not match:
+        return None
+    first = int(match.group(1))
+    last = int(match.group(2)) if match.group(2) else first
+    return (first, last) if first <= last else (last, first)
+
+
+# 节次写法转为 (首节, 末节)：3 -> (3, 3)，"3-4" -> (3, 4)，无法识别返回 None
+def section_span(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return _section_span_text(str(_plain_value(value)))
+
+
+# 节次写法转为整数（3、"3"、"第3节" -> 3；连堂取首节），无法识别返回 None
+def section_code(value):
+    span = section_span(value)
+    return None if span is None else span[0]
+
+
+# 规范化阶段：为星期/节次增加整数列（星期码、节次码、末节码、起止分钟），后续筛选统计都按整数比较
+# 连堂课保持一行，作为一个从首节开始、到末节结束的事件
+# 每个不重复的写法只解析一次；已规范化的表直接返回
+def canonicalize(course_df):
+    if all(col in course_df.columns for col in CANONICAL_COLUMNS):
+        return course_df
+    course_df = course_df.copy()
+    course_df[WEEKDAY_CODE] = map_unique(course_df["星期"], weekday_code).astype("Int8")
+    spans = map_unique(course_df["节次"], section_span)
+    course_df[SECTION_CODE] = spans.map(lambda span: None if span is None else span[0]).astype("Int8")
+    course_df[SECTION_END_CODE] = spans.map(lambda span: None if span is None else span[1]).astype("Int8")
+    minutes = map_unique(course_df["节次"], section_minutes)
+    course_df[START_MINUTE] = minutes.map(lambda span: None if span is None else span[0]).astype("Int16")
+    course_df[END_MINUTE] = minutes.map(lambda span: None if span is None else span[1]).astype("Int16")
+    return course_df
+
+
+# "HH:MM" 转为当天分钟数
+def time_to_minutes(hhmm):
+    hour, minute = map(int, hhmm.split(":"))
+    return hour * 60 + minute
+
+
+# 当天分钟数转为 "HH:MM"
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+# 节次对应的上课起止时间（当天分钟数），连堂课从首节开始到末节下课，无法识别的节次返回 None
+def section_minutes(section):
+    span = section_span(section)
+    if span is None:
+        return None
+    first_time = CLASS_TIME_MAP.get(str(span[0]), "")
+    last_time = CLASS_TIME_MAP.get(str(span[1]), "")
+    if not first_time or not last_time:
+        return None
+    return time_to_minutes(first_time), time_to_minutes(last_time) + CLASS_DURATION
@@ -0,0 +1,83 @@
+from functools import lru_cache
+
+import pandas as pd
+
+from ingest import map_unique
+
+# ---------------------- 本地关键词解析（替代百度NLP） ----------------------
+# 课前准备关键词库（可自定义扩展）
+PREPARE_KEYWORDS = ["课本", "习题集", "作业", "耳机", "U盘", "实验报告", "笔记本"]
+# 调课关键词库
+CHANGE_KEYWORDS = ["调至", "改为", "临时变更", "替换", "调整"]
+
+# 解析结果字段
+PREPARE_COLUMN = "准备项关键词"
+CHANGE_COLUMN = "调课关键词"
+
+# 已解析文本的缓存条数（进程内共享，跨上传、跨会话复用）
+KEYWORD_CACHE_SIZE = 8192
+
+# 关键词位掩码的编码表：关键词库 + 未命中时的占位词，第 i 位对应第 i 个词；空文本编码为 0
+PREPARE_VOCABULARY = PREPARE_KEYWORDS + ["无明确准备项"]
+CHANGE_VOCABULARY = CHANGE_KEYWORDS + ["无调课信息"]
+
+
+# 匹配时不区分大小写：关键词库预先转为小写（"U盘" 与 "带u盘"、"带U盘" 都能匹配），结果仍返回原关键词
+_PREPARE_MATCHERS = [(kw, kw.casefold()) for kw in PREPARE_KEYWORDS]
+_CHANGE_MATCHERS = [(kw, kw.casefold()) for kw in CHANGE_KEYWORDS]
+
+
+@lru_cache(maxsize=KEYWORD_CACHE_SIZE)
+def _match_prepare(text):
+    text = text.casefold()
+    matched = [kw for kw, folded in _PREPARE_MATCHERS if folded in text]
+    return matched if matched else ["无明确准备项"]
+
+
+@lru_cache(maxsize=KEYWORD_CACHE_SIZE)
+def _match_change(text):
+    text = text.casefold()
+    matched = [kw for kw, folded in _CHANGE_MATCHERS if folded in text]
+    return matched if matched else ["无调课信息"]
+
+
+# 本地解析课前准备关键词
+# 返回的列表在相同文本间共享，调用方不要原地修改
+def extract_prepare_keywords(text):
+    if pd.isna(text) or text == "":
+        return []
+    return _match_prepare(str(text))
+
+
+# 本地解析调课信息
+def extract_change_keywords(text):
+    if pd.isna(text) or text == "":
+        return []
+    return _match_change(str(text))
+
+
+# 为课程表增加关键词列
+# 先对 课前准备/备注 做 factorize，只解析不重复的文本，再按编码回填到每一行
+def parse_keywords(course_df):
+    course_df = course_df.copy()
+    course_df[PREPARE_COLUMN] = map_unique(course_df["课前准备"], extract_prepare_keywords)
+    course_df[CHANGE_COLUMN] = map_unique(course_df["备注"], extract_change_keywords)
+    return course_df
+
+
+# 关键词列表 -> 位掩码（用于列式存储）
+def keyword_mask(keywords, vocabulary):
+    mask = 0
+    for keyword in keywords:
+        mask |= 1 << vocabulary.index(keyword)
+    return mask
+
+
+@lru_cache(maxsize=1024)
+def _mask_keywords(mask, vocabulary):
+    return [keyword for i, keyword in enumerate(vocabulary) if mask >> i & 1]
+
+
+# 位掩码 -> 关键词列表
+def mask_keywords(mask, vocabulary):
+    return _mask_keywords(int(mask), tuple(vocabulary))
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from columnar_cache import load_timetable_cached
+from excel_export import sample_timetable_bytes
+from session_memory import state_bytes
+
+# ---------------------- 多会话压测 ----------------------
+# 用 Streamlit 的 AppTest 在本进程内模拟多个并发会话，按真实界面流程重跑 main()：
+#   上传（解析课程表并放入会话）→ 点击解析 → 提醒页刷新（模拟自动刷新）→ 统计页
+# AppTest 不支持模拟文件上传控件，上传步骤改为走同一条解析路径后写入会话状态
+
+# 每个步骤对应的按钮文字（None 表示直接重跑）
+STEPS = {
+    "upload": None,
+    "parse": "🔍 开始解析",
+    "reminder": "🔄 刷新提醒",
+    "statistics": None,
+}
+
+# 单次重跑的超时（秒），解析按钮中有模拟的等待时间
+RERUN_TIMEOUT = 60
+
+# 报告中的分位数
+PERCENTILES = (50, 90, 99)
+
+# 压测前写入会话的控件状态：关闭自动刷新，否则每次重跑末尾的 sleep + rerun 会让 AppTest 一直重跑到超时
+SESSION_DEFAULTS = {"auto_refresh": False}
+
+# 报告中每个步骤最多保留的错误信息条数
+MAX_ERROR_SAMPLES = 3
+
+
+def session_bytes(app_test):
+    return sum(state_bytes(app_test.session_state).values())
+
+
+def _click(app_test, label):
+    for button in app_test.button:
+        if button.label == label:
+            button.click()
+            return
+    raise LookupError(f"页面上没有按钮：{label}")
+
+
+# 一个会话跑完整流程 rounds 轮，返回 [(步骤, 耗时秒)]、会话内存和 [(步骤, 错误信息)]。
+# 某一步出错（页面异常、重跑超时、找不到按钮）只记录下来，继续跑后面的步骤，不中断整个压测
+def run_session(app_path, data, name, rounds):
+    from streamlit.testing.v1 import AppTest
+
+    timings, errors = [], []
+    app_test = AppTest.from_file(app_path, default_timeout=RERUN_TIMEOUT)
+    for key, value in SESSION_DEFAULTS.items():
+        app_test.session_state[key] = value
+    try:
+        app_test.run()
+    except Exception as exc:
+        return timings, 0, [("start", f"{type(exc).__name__}: {exc}")]
+
+    for _ in range(rounds):
+        for step, label in STEPS.items():
+            start = time.perf_counter()
+            try:
+                if step == "upload":
+                    app_test.session_state["course_df"] = load_timetable_cached(data, name)
+                elif label is not None:
+                    _click(app_test, label)
+                app_test.run()
+            except Exception as exc:
+                errors.append((step, f"{type(exc).__name__}: {exc}"))
+                continue
+            timings.append((step, time.perf_counter() - start))
+            if app_test.exception:
+                errors.append((step, app_test.exception[0].message))
+
+    return timings, session_bytes(app_test), errors
+
+
+# 按步骤汇总各会话的错误：总数、出错的会话数和部分错误信息
+def _error_report(results):
+    by_step = {}
+    for _, _, errors in results:
+        for step, message in errors:
+            entry = by_step.setdefault(step, {"count": 0, "samples": []})
+            entry["count"] += 1
+            if len(entry["samples"]) < MAX_ERROR_SAMPLES and message not in entry["samples"]:
+                entry["samples"].append(message)
+    return {
+        "total": sum(entry["count"] for entry in by_step.values()),
+        "sessions": sum(1 for _, _, errors in results if errors),
+        "by_step": by_step,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _max_rss_bytes():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _percentiles(values):
+    if not values:
+        return {}
+    values = np.asarray(values) * 1000
+    return {f"p{p}": round(float(np.percentile(values, p)), 1) for p in PERCENTILES}
+
+
+# 并发跑 sessions 个会话，汇总每个步骤的重跑延迟分位数、CPU 时间与内存
+def run_load_test(app_path, sessions, rounds=3, data=None, name="课程表示例.xlsx"):
+    data = data if data is not None else sample_timetable_bytes()
+    # 先解析一次，让所有会话命中同一份列式缓存（压测的是重跑，不是首次解析）
+    load_timetable_cached(data, name)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="kcb-session") as pool:
+        results = list(pool.map(lambda _: run_session(app_path, data, name, rounds), range(sessions)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    by_step = {step: [] for step in STEPS}
+    for timings, _, _ in results:
+        for step, seconds in timings:
+            by_step[step].append(seconds)
+    all_reruns = [seconds for timings, _, _ in results for _, seconds in timings]
+    session_memory = [memory for _, memory, _ in results]
+
+    return {
+        "app": os.path.basename(app_path),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "streamlit": _streamlit_version(),
+        "sessions": sessions,
+        "rounds": rounds,
+        "rows": int(len(load_timetable_cached(data, name))),
+        "reruns": len(all_reruns),
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_utilization": round(cpu / wall, 2) if wall else None,
+        "threads": threading.active_count(),
+        "max_rss_mb": round(_max_rss_bytes() / 1024 / 1024, 1),
+        "session_memory_kb": {
+            "mean": round(float(np.mean(session_memory)) / 1024, 1),
+            "max": round(float(np.max(session_memory)) / 1024, 1),
+        },
+        "latency_ms": {
+            "all": _percentiles(all_reruns),
+            **{step: _percentiles(values) for step, values in by_step.items() if values},
+        },
+        "errors": _error_report(results),
+    }
+
+
+def _streamlit_version():
+    import streamlit
+
+    return streamlit.__version__
+
+
+# 与基线结果逐项对比延迟分位数（用于比较两次提交）
+def compare(result, baseline):
+    lines = [f"对比基线：{baseline.get('commit')} -> {result.get('commit')}"]
+    for step, current in result["latency_ms"].items():
+        previous = baseline.get("latency_ms", {}).get(step)
+        if not previous:
+            continue
+        deltas = []
+        for key, value in current.items():
+            if previous.get(key):
+                deltas.append(f"{key} {previous[key]}→{value}ms（{(value / previous[key] - 1) * 100:+.0f}%）")
+        lines.append(f"  {step}: " + "，".join(deltas))
+    return "\n".join(lines)
+
+
+def format_report(result):
+    lines = [
+        f"{result['app']} @ {result['commit']}：{result['sessions']} 个会话 × {result['rounds']} 轮，"
+        f"共 {result['reruns']} 次重跑，课程表 {result['rows']} 行",
+        f"耗时 {result['wall_seconds']}s，CPU {result['cpu_seconds']}s（利用率 {result['cpu_utilization']}），"
+        f"峰值内存 {result['max_rss_mb']} MB，每会话 {result['session_memory_kb']['mean']} KB",
+    ]
+    for step, values in result["latency_ms"].items():
+        lines.append(f"  {step:<10} " + "  ".join(f"{key}={value}ms" for key, value in values.items()))
+    errors = result.get("errors", {})
+    if errors.get("total"):
+        lines.append(f"❌ {errors['sessions']} 个会话共出错 {errors['total']} 次")
+        for step, entry in errors["by_step"].items():
+            lines.append(f"  {step:<10} {entry['count']} 次：" + "；".join(entry["samples"]))
+    return "\n".join(lines)
+
+
+# ---------------------- 命令行入口 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模拟多个并发会话压测 Streamlit 应用，输出重跑延迟分位数、CPU 与内存")
+    parser.add_argument("--app", default="app_new.py", help="应用脚本（app_new.py / app_improved.py）")
+    parser.add_argument("--sessions", type=int, default=10, help="并发会话数")
+    parser.add_argument("--rounds", type=int, default=3, help="每个会话重复完整流程的轮数")
+    parser.add_argument("--file", help="压测用课程表（默认使用示例课程表）")
+    parser.add_argument("--output", help="将结果保存为JSON，便于不同提交之间对比")
+    parser.add_argument("--baseline", help="基线结果JSON，输出与之对比的延迟变化")
+    args = parser.parse_args(argv)
+
+    data, name = None, "课程表示例.xlsx"
+    if args.file:
+        with open(args.file, "rb") as fp:
+            data = fp.read()
+        name = os.path.basename(args.file)
+
+    result = run_load_test(args.app, args.sessions, args.rounds, data, name)
+    print(format_report(result))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fp:
+            print(compare(result, json.load(fp)))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            json.dump(result, fp, ensure_ascii=False, indent=2)
+    return 1 if result["errors"]["total"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+import argparse
+import datetime
+import glob
+import html
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_process import TIMETABLE_EXTENSIONS, collect_files
+from ics_export import current_week
+from ingest import (
+    START_MINUTE,
+    TERM_WEEKS,
+    WEEKDAY_CODE,
+    WEEKDAY_LABELS,
+    canonicalize,
+    format_minutes,
+    map_unique,
+    parse_weeks,
+    read_timetable,
+)
+from keywords import CHANGE_COLUMN, PREPARE_COLUMN, PREPARE_KEYWORDS, parse_keywords
+from workbook_ingest import GROUP_COLUMN, read_workbook, sheet_names
+
+# ---------------------- 次日课前准备清单（批量） ----------------------
+# 合并后课程表中标识学生的列（一个课程表文件即一名学生）
+STUDENT_COLUMN = "学生"
+
+# 除课程表外还接受 batch_process 输出的 Parquet
+DIGEST_EXTENSIONS = TIMETABLE_EXTENSIONS + (".parquet",)
+
+# 未识别到准备项/调课信息时的占位词
+NO_PREPARE = "无明确准备项"
+NO_CHANGE = "无调课信息"
+
+# 清单页面的样式
+DIGEST_STYLE = """
+<style>
+body { font-family: sans-serif; max-width: 40rem; margin: 2rem auto; color: #333; }
+h1 { color: #667eea; font-size: 1.4rem; }
+li { margin: 0.3rem 0; }
+.course { color: #666; font-size: 0.9rem; }
+.change { background: #fff4e5; border-left: 4px solid #ff9800; padding: 0.5rem; margin: 0.3rem 0; }
+</style>
+"""
+
+
+# 每个文件所在的输入根目录：目录输入为该目录，通配符输入为通配符之前的固定部分，
+# 学生标识相对于根目录计算，不带 in/、out/ 等输入目录本身的前缀
+def input_roots(inputs, files):
+    roots = []
+    for item in inputs:
+        if os.path.isdir(item):
+            roots.append(os.path.abspath(item))
+        elif glob.has_magic(item):
+            parts = item.replace(os.sep, "/").split("/")
+            fixed = next(i for i, part in enumerate(parts) if glob.has_magic(part))
+            roots.append(os.path.abspath("/".join(parts[:fixed]) or "."))
+        else:
+            roots.append(os.path.dirname(os.path.abspath(item)))
+    result = []
+    for path in files:
+        path = os.path.abspath(path)
+        matches = [root for root in roots if path.startswith(root.rstrip(os.sep) + os.sep)]
+        result.append(max(matches, key=len) if matches else os.path.dirname(path))
+    return result
+
+
+# 文件相对于根目录的名称（batch_process 输出的 y.xlsx.parquet 去掉 .parquet，与原文件 y.xlsx 同名）
+def source_name(path, root):
+    name = os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/")
+    if name.lower().endswith(".parquet"):
+        name = name[:-len(".parquet")]
+    return name
+
+
+# 学生标识：名称去掉扩展名；去掉扩展名后重名的文件（如 y.xlsx 与 y.csv）保留原扩展名以免合并成同一名学生
+def student_ids(names):
+    stems = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        stems.append(stem if ext.lower() in TIMETABLE_EXTENSIONS else name)
+    counts = pd.Series(stems, dtype=object).value_counts()
+    return [name if counts[stem] > 1 else stem for name, stem in zip(names, stems)]
+
+
+# 读取单个课程表：Parquet 直接读取；多工作表的工作簿按工作表解析并带上班级列
+def _read_courses(path):
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if lower.endswith(".xlsx") and len(sheet_names(path)) > 1:
+        return read_workbook(path, max_workers=1)
+    return parse_keywords(read_timetable(path))
+
+
+# 读取多个课程表并合并，增加学生列（已有学生列的文件保持原值）。
+# roots 为每个文件的根目录（默认所有文件所在目录的公共部分）；带班级列的表每个班级是一名学生（文件标识/班级）。
+# 同一课程表的原文件和 batch_process 输出同时出现时只读取 Parquet
+def load_students(paths, roots=None):
+    if roots is None:
+        base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths] or ["."])
+        roots = [base_dir] * len(paths)
+    sources = {}
+    for path, root in sorted(zip(paths, roots), key=lambda item: not item[0].lower().endswith(".parquet")):
+        sources.setdefault(source_name(path, root), path)
+    frames = []
+    for student, path in zip(student_ids(list(sources)), sources.values()):
+        course_df = _read_courses(path)
+        if STUDENT_COLUMN not in course_df.columns:
+            if GROUP_COLUMN in course_df.columns:
+                course_df[STUDENT_COLUMN] = student + "/" + course_df[GROUP_COLUMN].astype(str)
+            else:
+                course_df[STUDENT_COLUMN] = student
+        frames.append(course_df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[STUDENT_COLUMN])
+
+
+# 第 date 天所有学生要上的课（按学生、上课时间排序）
+def courses_on_date(course_df, date, term_start):
+    week = current_week(term_start, date)
+    if not 1 <= week <= TERM_WEEKS or len(course_df) == 0:
+        return course_df.iloc[:0]
+    if WEEKDAY_CODE not in course_df.columns:
+        course_df = canonicalize(course_df)
+    masks = map_unique(course_df["周次"], parse_weeks).to_numpy(dtype=np.int64)
+    on_day = (course_df[WEEKDAY_CODE] == date.isoweekday()).to_numpy(dtype=bool) & ((masks >> (week - 1)) & 1).astype(bool)
+    return course_df[on_day].sort_values([STUDENT_COLUMN, START_MINUTE], kind="stable")
+
+
+# 关键词列展开为 (行号, 关键词)，去掉占位词（列表和 Parquet 读回的数组都可以展开）
+def _explode_keywords(keyword_lists, placeholder):
+    exploded = keyword_lists.explode().dropna()
+    return exploded[exploded != placeholder]
+
+
+# 按分组键把值收集为列表：一次排序后按边界切分，不对每个分组调用 Python 聚合函数。
+# keys 为一列或多列（多列时按组合分组），返回 (每组第一行的位置, 每组的值列表)，各组按 keys 排序
+def _group_lists(keys, values):
+    if not isinstance(keys, list):
+        keys = [keys]
+    if len(keys[0]) == 0:
+        return np.zeros(0, dtype=np.int64), []
+    codes = [pd.factorize(np.asarray(key), sort=True)[0] for key in keys]
+    order = np.lexsort(codes[::-1])
+    combined = np.stack([code[order] for code in codes])
+    starts = np.flatnonzero(np.r_[True, (combined[:, 1:] != combined[:, :-1]).any(axis=0)])
+    values = np.asarray(values, dtype=object)[order]
+    ends = np.r_[starts[1:], len(values)]
+    lists = [values[start:end].tolist() for start, end in zip(starts.tolist(), ends.tolist())]
+    return order[starts], lists
+
+
+# 生成所有学生的准备清单：排序后按学生切分一次完成，不逐个学生筛选课程表。
+# 返回每名学生一行：学生、日期、周次、课程（时间/课程/教室）、准备清单（物品及需要它的课程）、调课（课程及备注）
+def build_digests(course_df, date, term_start):
+    day = courses_on_date(course_df, date, term_start).reset_index(drop=True)
+    columns = [STUDENT_COLUMN, "日期", "周次", "课程", "准备清单", "调课"]
+    if len(day) == 0:
+        return pd.DataFrame(columns=columns)
+    students = day[STUDENT_COLUMN].to_numpy()
+
+    times = map_unique(day[START_MINUTE], lambda start: format_minutes(int(start)) if pd.notna(start) else "")
+    course_entries = [
+        {"时间": start, "课程": name, "教室": room}
+        for start, name, room in zip(times.to_numpy(), day["课程名"].to_numpy(), day["教室"].to_numpy())
+    ]
+    first, course_lists = _group_lists(students, course_entries)
+    digests = pd.DataFrame({STUDENT_COLUMN: students[first], "课程": course_lists})
+
+    # 准备清单：(学生, 物品) 去重后按关键词库顺序排列，需要同一物品的课程合并在一起
+    prepare = _explode_keywords(day[PREPARE_COLUMN], NO_PREPARE)
+    items = pd.DataFrame({
+        STUDENT_COLUMN: students[prepare.index],
+        "物品": pd.Categorical(prepare.to_numpy(), categories=PREPARE_KEYWORDS).codes,
+        "课程": day["课程名"].to_numpy()[prepare.index],
+    }).drop_duplicates()
+    first, item_courses = _group_lists([items[STUDENT_COLUMN], items["物品"]], items["课程"])
+    item_entries = [
+        {"物品": PREPARE_KEYWORDS[item], "课程": names}
+        for item, names in zip(items["物品"].to_numpy()[first], item_courses)
+    ]
+    item_students = items[STUDENT_COLUMN].to_numpy()[first]
+    first, checklists = _group_lists(item_students, item_entries)
+    checklist = pd.Series(checklists, index=item_students[first], dtype=object)
+
+    # 调课：识别到调课关键词的课程及其备注
+    changed = _explode_keywords(day[CHANGE_COLUMN], NO_CHANGE).index.unique().to_numpy()
+    change_entries = [
+        {"课程": name, "备注": note}
+        for name, note in zip(day["课程名"].to_numpy()[changed], day["备注"].to_numpy()[changed])
+    ]
+    first, change_lists = _group_lists(students[changed], change_entries)
+    changes = pd.Series(change_lists, index=students[changed][first], dtype=object)
+
+    for column, grouped in (("准备清单", checklist), ("调课", changes)):
+        values = grouped.reindex(digests[STUDENT_COLUMN]).to_numpy()
+        digests[column] = [value if isinstance(value, list) else [] for value in values]
+    digests["日期"] = date.isoformat()
+    digests["周次"] = current_week(term_start, date)
+    return digests[columns]
+
+
+def _json_value(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+# 写出 JSONL：每名学生一行
+def write_jsonl(digests, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        for record in digests.to_dict("records"):
+            fp.write(json.dumps(record, ensure_ascii=False, default=_json_value))
+            fp.write("\n")
+    os.replace(tmp_path, path)
+
+
+# 单名学生的清单页面
+def digest_html(record):
+    date = datetime.date.fromisoformat(record["日期"])
+    title = f"{date.isoformat()}（第{record['周次']}周 {WEEKDAY_LABELS[date.weekday()]}）课前准备清单"
+    escape = lambda value: html.escape(str(value))
+    parts = [f"<h1>{escape(record[STUDENT_COLUMN])} · {escape(title)}</h1>", "<h2>📚 课程</h2><ul>"]
+    parts.extend(
+        f"<li>{escape(entry['时间'])} {escape(entry['课程'])} <span class=\"course\">{escape(entry['教室'])}</span></li>"
+        for entry in record["课程"]
+    )
+    parts.append("</ul><h2>🎒 需准备</h2><ul>")
+    parts.extend(
+        f"<li>☐ {escape(entry['物品'])} <span class=\"course\">（{escape('、'.join(map(str, entry['课程'])))}）</span></li>"
+        for entry in record["准备清单"]
+    )
+    if not record["准备清单"]:
+        parts.append("<li>没有需要特别准备的物品</li>")
+    parts.append("</ul>")
+    if record["调课"]:
+        parts.append("<h2>📢 调课提醒</h2>")
+        parts.extend(
+            f"<div class=\"change\">{escape(entry['课程'])}：{escape(entry['备注'])}</div>" for entry in record["调课"]
+        )
+    return f'<html><head><meta charset="utf-8">{DIGEST_STYLE}</head><body>{"".join(parts)}</body></html>'
+
+
+# 写出 HTML：每名学生一个文件（学生标识中的目录结构保留为子目录）
+def write_html(digests, output_dir):
+    for record in digests.to_dict("records"):
+        path = os.path.join(output_dir, f"{record[STUDENT_COLUMN]}.html")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write(digest_html(record))
+
+
+# ---------------------- 命令行入口（可由定时任务每晚运行） ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="为每名学生生成次日课前准备清单（JSONL / HTML）")
+    parser.add_argument("inputs", nargs="+", help="课程表目录或通配符（.xlsx / .csv / batch_process 输出的 .parquet）")
+    parser.add_argument("--term-start", required=True, type=datetime.date.fromisoformat, help="第1周星期一（YYYY-MM-DD）")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, help="清单日期（默认明天）")
+    parser.add_argument("--output-dir", required=True, help="输出目录")
+    parser.add_argument("--format", choices=["jsonl", "html", "both"], default="both", help="输出格式")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.inputs, DIGEST_EXTENSIONS)
+    if not files:
+        print("未找到课程表文件（.xlsx / .csv / .parquet）")
+        return 1
+    date = args.date or datetime.date.today() + datetime.timedelta(days=1)
+
+    start = time.perf_counter()
+    course_df = load_students(files, input_roots(args.inputs, files))
+    loaded = time.perf_counter()
+    digests = build_digests(course_df, date, args.term_start)
+    built = time.perf_counter()
+    if args.format in ("jsonl", "both"):
+        write_jsonl(digests, os.path.join(args.output_dir, f"digest-{date.isoformat()}.jsonl"))
+    if args.format in ("html", "both"):
+        write_html(digests, os.path.join(args.output_dir, date.isoformat()))
+    written = time.perf_counter()
+
+    print(
+        f"✅ {date.isoformat()}：{course_df[STUDENT_COLUMN].nunique()} 名学生中 {len(digests)} 人有课"
+        f"（读取 {loaded - start:.1f}s，生成 {built - loaded:.2f}s，写出 {written - built:.1f}s）"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
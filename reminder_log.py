@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+
+# ---------------------- 提醒投递记录 ----------------------
+# 投递记录保留多久（小时，可用环境变量 KCB_REMINDER_LOG_TTL_HOURS 覆盖）；提醒最多提前一天生效，保留两天足够
+LOG_TTL_SECONDS = float(os.environ.get("KCB_REMINDER_LOG_TTL_HOURS", "48")) * 3600
+
+# 两次清理过期记录的最短间隔（秒），避免每次投递都遍历全部记录
+EVICT_INTERVAL = 60
+
+
+# 提醒的投递键：(用户, 课程, 日期, 提醒类型)；课程用"课程名@上课时间"区分同一天上两次的同名课程
+def delivery_key(user, reminder):
+    return (user, f"{reminder['course']}@{reminder['time']}", reminder["date"], reminder["kind"])
+
+
+# 投递记录（整个服务共享一个实例）：记录每条提醒第一次投递和被确认的时间。
+# 同一个键只会投递一次，之后的重跑不再重复弹出；用户确认后不再显示；超过 ttl 的记录定期清理
+class DeliveryLog:
+    def __init__(self, ttl=LOG_TTL_SECONDS, evict_interval=EVICT_INTERVAL):
+        self.ttl = ttl
+        self.evict_interval = evict_interval
+        self._delivered = {}
+        self._acked = {}
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+
+    # 记录投递，第一次投递返回 True，已投递过返回 False（检查与写入是原子的，并发重跑也只投递一次）
+    def record(self, key, now=None):
+        now = now or time.time()
+        with self._lock:
+            self._evict(now)
+            if key in self._delivered:
+                return False
+            self._delivered[key] = now
+            return True
+
+    def delivered(self, key):
+        with self._lock:
+            return key in self._delivered
+
+    # 用户确认收到提醒（未投递过的提醒也可以确认，之后不再投递）
+    def ack(self, key, now=None):
+        now = now or time.time()
+        with self._lock:
+            self._delivered.setdefault(key, now)
+            self._acked[key] = now
+
+    def acked(self, key):
+        with self._lock:
+            return key in self._acked
+
+    # 清理超过 ttl 的记录，返回清理的条数；force=True 时忽略清理间隔
+    def evict(self, now=None, force=False):
+        with self._lock:
+            return self._evict(now or time.time(), force)
+
+    def _evict(self, now, force=False):
+        if not force and now - self._last_scan < self.evict_interval:
+            return 0
+        self._last_scan = now
+        expired = [key for key, delivered_at in self._delivered.items() if now - delivered_at >= self.ttl]
+        for key in expired:
+            del self._delivered[key]
+            self._acked.pop(key, None)
+        return len(expired)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._delivered)
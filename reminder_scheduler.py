@@ -0,0 +1,172 @@
+import datetime
+import heapq
+import itertools
+
+from ingest import START_MINUTE, WEEKDAY_CODE, format_minutes, time_to_minutes
+from keywords import CHANGE_COLUMN, PREPARE_COLUMN
+from reminder_log import delivery_key
+
+# ---------------------- 提醒调度 ----------------------
+# 提醒在触发时刻前后各保持多少分钟（原先的 55-65 分钟、25-35 分钟窗口即 ±5 分钟）
+REMINDER_WINDOW = 5
+
+# 未识别到准备项/调课信息时的占位词
+NO_PREPARE = "无明确准备项"
+NO_CHANGE = "无调课信息"
+
+
+# 提醒提前量：minutes 为课前多少分钟；evening_at 为前一天的固定时刻（如 "20:00"，一直保持到当天结束）
+# prepare_only 表示只对有课前准备事项的课程提醒
+class LeadTime:
+    def __init__(self, name, label, minutes=None, evening_at=None, prepare_only=False, window=REMINDER_WINDOW):
+        self.name = name
+        self.label = label
+        self.minutes = minutes
+        self.evening_at = evening_at
+        self.prepare_only = prepare_only
+        self.window = window
+
+    # 提醒对某节课有效的时间段 [开始, 结束)
+    def active_range(self, class_start):
+        if self.evening_at is not None:
+            day_before = datetime.datetime.combine(class_start.date() - datetime.timedelta(days=1), datetime.time())
+            start = day_before + datetime.timedelta(minutes=time_to_minutes(self.evening_at))
+            return start, day_before + datetime.timedelta(days=1)
+        fire = class_start - datetime.timedelta(minutes=self.minutes)
+        window = datetime.timedelta(minutes=self.window)
+        return fire - window, fire + window + datetime.timedelta(minutes=1)
+
+    # 提醒样式：一小时以上和前一晚的提醒为准备提醒，其余为即将上课提醒
+    @property
+    def style(self):
+        if self.evening_at is not None:
+            return "evening_before"
+        return "hour_before" if self.minutes >= 60 else "half_hour_before"
+
+
+# 可选的提前量（键为保存在用户设置中的名称）
+LEAD_TIME_PRESETS = {
+    "2h": LeadTime("2h", "课前2小时", minutes=120),
+    "1h": LeadTime("1h", "课前1小时", minutes=60),
+    "30m": LeadTime("30m", "课前30分钟", minutes=30),
+    "15m": LeadTime("15m", "课前15分钟", minutes=15),
+    "evening": LeadTime("evening", "前一晚", evening_at="20:00", prepare_only=True),
+}
+
+# 默认提前量（与原来的课前1小时、课前30分钟提醒一致）
+DEFAULT_LEAD_TIMES = ("1h", "30m")
+
+
+def _real_keywords(keywords, placeholder):
+    if not isinstance(keywords, list):
+        return []
+    return [keyword for keyword in keywords if keyword != placeholder]
+
+
+def _reminder_content(lead, course, class_time, prepare):
+    name, classroom = course["课程名"], course["教室"]
+    if lead.style == "evening_before":
+        return f"🌙 明日课前准备 | {name}（{class_time}，{classroom}）\n需准备：{','.join(prepare)}"
+    if lead.style == "hour_before":
+        return f"⏰ {lead.label}提醒 | {name}（{classroom}）\n需准备：{','.join(course.get(PREPARE_COLUMN) or [])}"
+    return f"🚨 {lead.label}提醒 | {name}即将开始！\n教室：{classroom}"
+
+
+# 提醒调度器：预先为 [start_date, start_date + days) 内每节课、每个提前量生成 (生效时间, 提醒) 事件放入最小堆，
+# 查询时只弹出已到生效时间的事件（每个事件 O(log n)），并丢弃已过期的事件；增加提前量只是多几个事件，不再多扫一遍课程表
+class ReminderScheduler:
+    def __init__(self, course_df, lead_times=DEFAULT_LEAD_TIMES, start_date=None, days=2):
+        self.lead_times = [LEAD_TIME_PRESETS[name] if isinstance(name, str) else name for name in lead_times]
+        self.start_date = start_date or datetime.date.today()
+        self.days = days
+        self._course_df = course_df
+        self._build()
+
+    def _build(self):
+        self._order = itertools.count()
+        self._heap = []
+        self._active = []
+        self._last_now = None
+        self._delivered = set()
+        self._acked = set()
+        for offset in range(self.days):
+            self._schedule_day(self.start_date + datetime.timedelta(days=offset))
+
+    def _push(self, start, end, order, reminder):
+        if end > datetime.datetime.combine(self.start_date, datetime.time()):
+            heapq.heappush(self._heap, (start, order, next(self._order), end, reminder))
+
+    # 为某一天的课程生成提醒事件
+    def _schedule_day(self, date):
+        course_df = self._course_df
+        day_courses = course_df[(course_df[WEEKDAY_CODE] == date.isoweekday()) & course_df[START_MINUTE].notna()]
+        day_start = datetime.datetime.combine(date, datetime.time())
+        for row, course in day_courses.iterrows():
+            class_start = day_start + datetime.timedelta(minutes=int(course[START_MINUTE]))
+            class_time = format_minutes(int(course[START_MINUTE]))
+            prepare = _real_keywords(course.get(PREPARE_COLUMN), NO_PREPARE)
+            base = {"course": course["课程名"], "time": class_time, "date": date.isoformat(), "row": row}
+
+            for lead in self.lead_times:
+                if lead.prepare_only and not prepare:
+                    continue
+                start, end = lead.active_range(class_start)
+                self._push(start, end, (class_start, row), {
+                    **base,
+                    "type": lead.style,
+                    "kind": lead.name,
+                    "content": _reminder_content(lead, course, class_time, prepare),
+                })
+
+            # 调课提醒：上课当天全天有效
+            if _real_keywords(course.get(CHANGE_COLUMN), NO_CHANGE):
+                self._push(day_start, day_start + datetime.timedelta(days=1), (class_start, row), {
+                    **base,
+                    "type": "change",
+                    "kind": "change",
+                    "content": f"📢 调课提醒 | {course['课程名']}\n备注：{course['备注']}",
+                })
+
+    # 当前生效的事件（按上课时间排序）；now 需单调不减，回退时重新生成事件
+    def _due(self, now):
+        if self._last_now is not None and now < self._last_now:
+            self._build()
+        self._last_now = now
+        while self._heap and self._heap[0][0] <= now:
+            self._active.append(heapq.heappop(self._heap))
+        self._active = [event for event in self._active if event[3] > now]
+        return sorted(self._active, key=lambda event: (event[1], event[2]))
+
+    # 当前生效的提醒（按上课时间排序）
+    def active(self, now=None):
+        return [event[4] for event in self._due(now or datetime.datetime.now())]
+
+    # 按投递记录投递当前生效的提醒，返回 (本次第一次投递的提醒, 尚未确认的提醒)。
+    # 已投递/已确认的事件记在调度器中，之后的重跑直接跳过，不再查询投递记录
+    def deliver(self, log, user, now=None):
+        now = now or datetime.datetime.now()
+        delivered, pending = [], []
+        for _, _, seq, _, reminder in self._due(now):
+            if seq in self._acked:
+                continue
+            key = delivery_key(user, reminder)
+            if seq not in self._delivered:
+                self._delivered.add(seq)
+                if log.record(key, now.timestamp()):
+                    delivered.append(reminder)
+            if log.acked(key):
+                self._acked.add(seq)
+                continue
+            pending.append(reminder)
+        return delivered, pending
+
+    # 下一个将要生效的提醒时间（没有则为 None），可用于决定下次刷新的时间
+    def next_fire_time(self):
+        return self._heap[0][0] if self._heap else None
+
+
+# 计算当前生效的提醒（不保留调度器时使用，每次调用都会重新生成当天事件）
+def check_reminder(course_df, lead_times=DEFAULT_LEAD_TIMES, now=None):
+    now = now or datetime.datetime.now()
+    return ReminderScheduler(course_df, lead_times, now.date()).active(now)
+
@@ -0,0 +1,151 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ingest import (
+    REQUIRED_COLUMNS,
+    WEEKDAY_LABELS,
+    canonicalize,
+    format_minutes,
+    format_weeks,
+    map_unique,
+    parse_weeks,
+    read_timetable,
+    section_minutes,
+    weekday_code,
+)
+from keywords import parse_keywords
+
+# ---------------------- 多课程表合并与选课冲突检测 ----------------------
+# 合并后标记每行来自哪份课程表
+SOURCE_COLUMN = "来源"
+
+# 选课冲突报告字段
+CLASH_COLUMNS = ["分组", "星期", "课程A", "课程B", "来源A", "来源B", "时间A", "时间B", "冲突周次"]
+
+
+# 合并多份课程表为一张表，sources 为各表名称（默认 课表1、课表2 ...）
+# 合并结果与单个课程表一样带有规范化列和关键词列，可以直接替换会话中的课程表；缺少必需字段时抛出 ValueError
+def merge_timetables(frames, sources=None):
+    frames = list(frames)
+    if sources is None:
+        sources = [f"课表{i + 1}" for i in range(len(frames))]
+    if not frames:
+        return pd.DataFrame()
+    for frame, source in zip(frames, sources):
+        missing = [col for col in REQUIRED_COLUMNS if col not in frame.columns]
+        if missing:
+            raise ValueError(f"{source} 缺少必需字段：{', '.join(missing)}")
+    merged = pd.concat(
+        [canonicalize(frame).assign(**{SOURCE_COLUMN: source}) for frame, source in zip(frames, sources)],
+        ignore_index=True,
+    )
+    return parse_keywords(merged)
+
+
+# 构建时间区间索引：每行一个 [开始, 结束) 区间，按 (分组, 星期, 开始时间) 排序
+# "行" 为原表中的位置下标，"星期" 为星期码 1-7；无法识别星期/节次的行不参与冲突检测
+def build_interval_index(course_df, group_col=None):
+    spans = map_unique(course_df["节次"], section_minutes)
+    weekdays = map_unique(course_df["星期"], weekday_code)
+    valid = (spans.notna() & weekdays.notna()).to_numpy()
+    spans = spans[valid]
+
+    index = pd.DataFrame({
+        "行": np.flatnonzero(valid),
+        "分组": course_df[group_col].astype(str).to_numpy()[valid] if group_col else "",
+        "星期": weekdays.to_numpy()[valid].astype(np.int8),
+        "开始": np.fromiter((span[0] for span in spans), dtype=np.int32, count=len(spans)),
+        "结束": np.fromiter((span[1] for span in spans), dtype=np.int32, count=len(spans)),
+        "周次位图": map_unique(course_df["周次"], parse_weeks).to_numpy()[valid],
+    })
+    return index.sort_values(["分组", "星期", "开始"], kind="stable", ignore_index=True)
+
+
+# 检测合并后课程表中的时间冲突
+# 按 (分组, 星期) 排好序后一次扫描：维护仍在进行中的课程列表，
+# 新课程只与尚未结束的课程比较周次位图，所有学生/分组在同一趟扫描中完成
+def detect_time_clashes(course_df, group_col=None):
+    index = build_interval_index(course_df, group_col)
+    if index.empty:
+        return pd.DataFrame(columns=CLASH_COLUMNS)
+
+    names = course_df["课程名"].to_numpy()
+    if SOURCE_COLUMN in course_df.columns:
+        sources = course_df[SOURCE_COLUMN].to_numpy()
+    else:
+        sources = np.full(len(course_df), "", dtype=object)
+
+    clashes = []
+    active = []
+    current_key = None
+    for row, group, weekday, start, end, mask in zip(
+        index["行"].tolist(), index["分组"].tolist(), index["星期"].tolist(),
+        index["开始"].tolist(), index["结束"].tolist(), index["周次位图"].tolist(),
+    ):
+        if (group, weekday) != current_key:
+            current_key = (group, weekday)
+            active = []
+        elif active:
+            active = [item for item in active if item[2] > start]
+        for prev_row, prev_start, prev_end, prev_mask in active:
+            overlap = mask & prev_mask
+            if overlap:
+                clashes.append({
+                    "分组": group,
+                    "星期": WEEKDAY_LABELS[weekday - 1],
+                    "课程A": names[prev_row],
+                    "课程B": names[row],
+                    "来源A": sources[prev_row],
+                    "来源B": sources[row],
+                    "时间A": f"{format_minutes(prev_start)}-{format_minutes(prev_end)}",
+                    "时间B": f"{format_minutes(start)}-{format_minutes(end)}",
+                    "冲突周次": format_weeks(overlap),
+                })
+        active.append((row, start, end, mask))
+
+    return pd.DataFrame(clashes, columns=CLASH_COLUMNS)
+
+
+# ---------------------- 命令行批量检测 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合并多份课程表并检测上课时间冲突")
+    parser.add_argument("files", nargs="+", help="课程表文件（.xlsx / .csv）")
+    parser.add_argument("--group-by", help="按该字段分组检测（如 学生），不指定则视为同一人的选课")
+    parser.add_argument("--output", help="将合并后的课程表另存为CSV文件")
+    parser.add_argument("--csv", help="将冲突明细另存为CSV文件")
+    args = parser.parse_args(argv)
+
+    try:
+        merged = merge_timetables(
+            (read_timetable(path) for path in args.files),
+            [os.path.basename(path) for path in args.files],
+        )
+    except ValueError as exc:
+        print(f"❌ {exc}")
+        return 1
+    clashes = detect_time_clashes(merged, args.group_by)
+
+    if clashes.empty:
+        print(f"✅ 已合并 {len(args.files)} 份课程表（{len(merged)} 行），未发现时间冲突")
+    else:
+        print(f"⚠️ 已合并 {len(args.files)} 份课程表（{len(merged)} 行），发现 {len(clashes)} 处时间冲突")
+        for _, clash in clashes.iterrows():
+            prefix = f"[{clash['分组']}] " if args.group_by else ""
+            print(
+                f"- {prefix}{clash['星期']} {clash['课程A']}（{clash['来源A']} {clash['时间A']}） ↔ "
+                f"{clash['课程B']}（{clash['来源B']} {clash['时间B']}） | {clash['冲突周次']}"
+            )
+
+    if args.output:
+        merged.to_csv(args.output, index=False, encoding="utf-8-sig")
+    if args.csv:
+        clashes.to_csv(args.csv, index=False, encoding="utf-8-sig")
+    return 1 if len(clashes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import argparse
+import sys
+import time
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from ingest import map_unique, read_timetable
+
+# ---------------------- 课程表全文搜索 ----------------------
+# 参与搜索的文本字段
+SEARCH_COLUMNS = ["课程名", "教室", "课前准备", "备注"]
+
+# 拼接各字段时使用的分隔符（不会出现在查询中，保证匹配不会跨字段）
+_FIELD_SEPARATOR = "\x1f"
+
+
+# 文本规范化：全角转半角、英文小写，空值为空串
+@lru_cache(maxsize=65536)
+def _normalize_text(text):
+    return unicodedata.normalize("NFKC", text).lower().strip()
+
+
+def normalize(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return _normalize_text(str(value))
+
+
+# 文本的字符 n-gram：单字 + 相邻两字（中文不分词，二元组足以定位词语）
+def ngrams(text):
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    grams.discard(_FIELD_SEPARATOR)
+    return grams
+
+
+# 查询词用于查倒排表的 n-gram：两个字以上用二元组，单字用单字
+def _query_grams(term):
+    if len(term) == 1:
+        return {term}
+    return {term[i:i + 2] for i in range(len(term) - 1)}
+
+
+# 倒排索引：以"文档"（各搜索字段取值完全相同的行合并为一个文档）为单位建立 n-gram -> 文档ID 的倒排表，
+# 查询时在文档上求交集，再由文档映射回行号。重新上传课程表时只为新出现的文档建索引、只从倒排表中删除消失的文档
+class SearchIndex:
+    def __init__(self, columns=SEARCH_COLUMNS):
+        self.columns = list(columns)
+        self._postings = {}
+        self._doc_ids = {}
+        self._doc_texts = {}
+        self._next_doc = 0
+        self._arrays = {}
+        self._row_docs = np.zeros(0, dtype=np.int64)
+        self.row_count = 0
+
+    def _add_doc(self, key):
+        doc = self._next_doc
+        self._next_doc += 1
+        text = _FIELD_SEPARATOR.join(key)
+        self._doc_ids[key] = doc
+        self._doc_texts[doc] = text
+        for field in key:
+            for gram in ngrams(field):
+                self._postings.setdefault(gram, set()).add(doc)
+                self._arrays.pop(gram, None)
+        return doc
+
+    def _remove_doc(self, key):
+        doc = self._doc_ids.pop(key)
+        del self._doc_texts[doc]
+        for field in key:
+            for gram in ngrams(field):
+                self._arrays.pop(gram, None)
+                posting = self._postings.get(gram)
+                if posting is not None:
+                    posting.discard(doc)
+                    if not posting:
+                        del self._postings[gram]
+
+    # 按新课程表增量更新，返回 (新增文档数, 删除文档数)
+    def update(self, course_df):
+        normalized = pd.DataFrame({
+            col: map_unique(course_df[col], normalize).to_numpy() if col in course_df.columns else ""
+            for col in self.columns
+        }, index=range(len(course_df)))
+        codes, uniques = pd.factorize(pd.MultiIndex.from_frame(normalized))
+        keys = list(uniques)
+
+        current = set(keys)
+        removed = [key for key in self._doc_ids if key not in current]
+        for key in removed:
+            self._remove_doc(key)
+        added = 0
+        doc_of_unique = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            doc = self._doc_ids.get(key)
+            if doc is None:
+                doc = self._add_doc(key)
+                added += 1
+            doc_of_unique[i] = doc
+
+        # 每行对应的文档ID：查询时用文档掩码一次取出所有匹配行
+        self._row_docs = doc_of_unique[codes]
+        self.row_count = len(course_df)
+        return added, len(removed)
+
+    # n-gram 的倒排表（文档ID数组），数组在首次查询时由集合生成并缓存，该 n-gram 的文档变化后失效
+    def _posting_array(self, gram):
+        array = self._arrays.get(gram)
+        if array is None:
+            posting = self._postings.get(gram, ())
+            array = np.fromiter(posting, dtype=np.int64, count=len(posting))
+            self._arrays[gram] = array
+        return array
+
+    # 匹配所有查询词（空格分隔，均需命中，可分布在不同字段）的文档，返回按文档ID的布尔掩码
+    def _match_docs(self, query):
+        terms = [normalize(term) for term in str(query).split()]
+        terms = [term for term in terms if term]
+        if not terms:
+            return None
+        matched = np.ones(self._next_doc, dtype=bool)
+        for term in terms:
+            for gram in _query_grams(term):
+                hit = np.zeros(self._next_doc, dtype=bool)
+                hit[self._posting_array(gram)] = True
+                matched &= hit
+            # 二元组都命中不代表连续出现（如"高数学"与"高等数学"），逐个核对原文
+            if len(term) > 2:
+                for doc in np.flatnonzero(matched):
+                    if term not in self._doc_texts[doc]:
+                        matched[doc] = False
+            if not matched.any():
+                break
+        return matched
+
+    # 搜索，返回匹配行的位置（iloc，升序）；查询为空时返回所有行
+    def search(self, query, limit=None):
+        matched = self._match_docs(query)
+        rows = np.arange(self.row_count) if matched is None else np.flatnonzero(matched[self._row_docs])
+        return rows[:limit] if limit is not None else rows
+
+
+# 由课程表构建搜索索引
+def build_search_index(course_df, columns=SEARCH_COLUMNS):
+    index = SearchIndex(columns)
+    index.update(course_df)
+    return index
+
+
+# ---------------------- 命令行搜索 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在课程表的课程名、教室、课前准备、备注中搜索")
+    parser.add_argument("files", nargs="+", help="课程表文件（.xlsx / .csv），多个文件会合并搜索")
+    parser.add_argument("--query", "-q", required=True, help="搜索词，空格分隔的多个词需同时命中")
+    parser.add_argument("--limit", type=int, default=20, help="最多显示的行数")
+    args = parser.parse_args(argv)
+
+    course_df = pd.concat([read_timetable(path) for path in args.files], ignore_index=True)
+    start = time.perf_counter()
+    index = build_search_index(course_df)
+    built = time.perf_counter()
+    rows = index.search(args.query)
+    searched = time.perf_counter()
+
+    print(
+        f"共 {len(rows)} 行匹配（建索引 {(built - start) * 1000:.0f} ms，搜索 {(searched - built) * 1000:.2f} ms）"
+    )
+    if len(rows):
+        print(course_df.iloc[rows[:args.limit]][[col for col in SEARCH_COLUMNS if col in course_df.columns]].to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from columnar_cache import CHANGE_MASK_COLUMN, from_columnar, text_object_columns, to_columnar
+from keywords import CHANGE_COLUMN, PREPARE_COLUMN
+
+# ---------------------- 会话内存统计与空闲会话换出 ----------------------
+# 快照目录（可用环境变量 KCB_SNAPSHOT_DIR 覆盖）
+SNAPSHOT_DIR = os.environ.get("KCB_SNAPSHOT_DIR", ".kcb_sessions")
+
+# 会话空闲多久后换出（分钟，可用环境变量 KCB_SESSION_IDLE_MINUTES 覆盖）
+IDLE_SECONDS = float(os.environ.get("KCB_SESSION_IDLE_MINUTES", "30")) * 60
+
+# 两次扫描空闲会话的最短间隔（秒），避免每次重跑都遍历所有会话
+EVICT_INTERVAL = 60
+
+# 换出时写入快照、恢复时读回的键
+SPILL_KEYS = ("course_df",)
+
+# 换出时直接丢弃的派生结构（下次用到时会按 course_df 重新生成）
+DROP_KEYS = (
+    "occupancy_index", "occupancy_source",
+    "export_bytes", "export_source",
+    "calendar_bytes", "calendar_source", "calendar_key",
+    "search_index", "search_source",
+    "week_grid", "week_grid_source",
+    "utilization_cube", "utilization_source",
+    "reminder_scheduler", "reminder_source", "reminder_key",
+)
+
+# 会话断开多久后从登记表删除（秒，与 Streamlit 默认保留断开会话的时间一致），期间重连不会丢失快照
+DISCONNECT_GRACE = 120
+
+# 会话中记录快照路径的键
+SNAPSHOT_KEY = "session_snapshot"
+
+
+# 对象占用的字节数（DataFrame 按深度统计，numpy 数组按数据大小，其余对象粗略估计）
+def object_bytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    counts = getattr(value, "counts", None)
+    if isinstance(counts, np.ndarray):
+        return int(counts.nbytes) + sys.getsizeof(value)
+    return sys.getsizeof(value)
+
+
+# 会话状态的用户键值（Streamlit 内部会话对象用 filtered_state，普通映射直接复制）
+def _state_items(state):
+    filtered = getattr(state, "filtered_state", None)
+    return dict(filtered if filtered is not None else state)
+
+
+# 会话状态中各键占用的字节数（从大到小）
+# 同一个对象被多个键引用时（如 occupancy_source 指向 course_df）只计一次
+def state_bytes(state):
+    usage = {}
+    seen = set()
+    for key, value in _state_items(state).items():
+        usage[key] = 0 if id(value) in seen else object_bytes(value)
+        seen.add(id(value))
+    return dict(sorted(usage.items(), key=lambda item: item[1], reverse=True))
+
+
+def snapshot_path(session_id, snapshot_dir=None):
+    return os.path.join(snapshot_dir or SNAPSHOT_DIR, f"{session_id}.arrow")
+
+
+# 把会话中的课程表写入压缩快照，并删除重量级状态，返回释放的字节数
+def spill(state, session_id, snapshot_dir=None):
+    import pyarrow as pa
+
+    if SNAPSHOT_KEY in state or not any(key in state for key in SPILL_KEYS + DROP_KEYS):
+        return 0
+    freed = sum(state_bytes({key: state[key] for key in SPILL_KEYS + DROP_KEYS if key in state}).values())
+
+    course_df = state["course_df"] if "course_df" in state else None
+    if course_df is not None:
+        if PREPARE_COLUMN in course_df.columns and CHANGE_COLUMN in course_df.columns:
+            columnar = to_columnar(course_df)
+        else:
+            columnar = text_object_columns(course_df.copy())
+        table = pa.Table.from_pandas(columnar, preserve_index=False)
+        path = snapshot_path(session_id, snapshot_dir)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        with pa.OSFile(f"{path}.tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+        state[SNAPSHOT_KEY] = path
+
+    for key in SPILL_KEYS + DROP_KEYS:
+        if key in state:
+            del state[key]
+    return freed
+
+
+# 会话再次活跃时读回快照（没有被换出时什么也不做），返回是否恢复了状态
+def rehydrate(state):
+    import pyarrow as pa
+
+    if SNAPSHOT_KEY not in state:
+        return False
+    path = state[SNAPSHOT_KEY]
+    del state[SNAPSHOT_KEY]
+    if not os.path.exists(path):
+        return False
+    with pa.OSFile(path, "rb") as source:
+        columnar = pa.ipc.open_file(source).read_all().to_pandas()
+    state["course_df"] = from_columnar(columnar) if CHANGE_MASK_COLUMN in columnar.columns else columnar
+    os.remove(path)
+    return True
+
+
+# 所有会话的登记表（整个服务共享一个实例）：记录每个会话最近一次活跃时间，
+# 定期把空闲超过 idle_seconds 的会话换出到磁盘。登记表持有会话状态对象本身（强引用），
+# 由 is_alive(会话ID) 判断会话是否仍连接，断开超过 disconnect_grace 秒的会话从登记表删除并清理快照
+class SessionRegistry:
+    def __init__(self, idle_seconds=IDLE_SECONDS, snapshot_dir=None, evict_interval=EVICT_INTERVAL,
+                 is_alive=None, disconnect_grace=DISCONNECT_GRACE):
+        self.idle_seconds = idle_seconds
+        self.snapshot_dir = snapshot_dir
+        self.evict_interval = evict_interval
+        self.is_alive = is_alive
+        self.disconnect_grace = disconnect_grace
+        self._sessions = {}
+        self._gone_since = {}
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+
+    # 记录会话活跃（每次重跑调用）
+    def touch(self, session_id, state, now=None):
+        with self._lock:
+            self._sessions[session_id] = (state, now or time.time())
+            self._gone_since.pop(session_id, None)
+
+    # 删除会话登记，并删除它留在磁盘上的快照
+    def forget(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            self._gone_since.pop(session_id, None)
+        if entry is not None and SNAPSHOT_KEY in entry[0]:
+            path = entry[0][SNAPSHOT_KEY]
+            if os.path.exists(path):
+                os.remove(path)
+
+    # 换出空闲会话，返回 {会话ID: 释放的字节数}；force=True 时忽略扫描间隔
+    def evict_idle(self, now=None, force=False):
+        now = now or time.time()
+        with self._lock:
+            if not force and now - self._last_scan < self.evict_interval:
+                return {}
+            self._last_scan = now
+            sessions = list(self._sessions.items())
+
+        evicted = {}
+        for session_id, (state, last_seen) in sessions:
+            if self.is_alive is not None and not self.is_alive(session_id):
+                gone_since = self._gone_since.setdefault(session_id, now)
+                if now - gone_since >= self.disconnect_grace:
+                    self.forget(session_id)
+                continue
+            self._gone_since.pop(session_id, None)
+            if now - last_seen >= self.idle_seconds:
+                freed = spill(state, session_id, self.snapshot_dir)
+                if freed:
+                    evicted[session_id] = freed
+        return evicted
+
+    # 各会话的空闲时间、占用内存和是否已换出
+    def usage(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            sessions = list(self._sessions.items())
+        rows = []
+        for session_id, (state, last_seen) in sessions:
+            rows.append({
+                "会话": session_id[:8],
+                "空闲秒数": round(now - last_seen),
+                "内存字节": sum(state_bytes(state).values()),
+                "已换出": SNAPSHOT_KEY in state,
+            })
+        return pd.DataFrame(rows, columns=["会话", "空闲秒数", "内存字节", "已换出"])
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
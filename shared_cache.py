@@ -0,0 +1,401 @@
+import argparse
+import io
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from columnar_cache import cache_key, from_columnar, load_timetable_cached, to_columnar
+from keywords import CHANGE_COLUMN, PREPARE_COLUMN
+
+# ---------------------- 多副本共享缓存 ----------------------
+# 缓存地址（可用环境变量 KCB_CACHE_URL 设置），支持：
+#   memory://                 进程内缓存
+#   file:///路径 或 disk:路径  磁盘目录（多个副本挂载同一目录即可共享）
+#   redis://主机:端口/库号     Redis 协议服务器
+CACHE_URL = os.environ.get("KCB_CACHE_URL", "")
+
+# 键前缀：不同类型的缓存对象放在不同命名空间下
+TIMETABLE_PREFIX = "kcb:timetable:"
+
+# 进程内缓存的容量上限（字节）
+MEMORY_CACHE_BYTES = 256 * 1024 * 1024
+
+# 序列化格式标记：Arrow IPC
+_ARROW = b"A"
+
+
+# ---------------------- 序列化 ----------------------
+# 只缓存 DataFrame，存为 zstd 压缩的 Arrow IPC（关键词列表换成位掩码）。
+# 缓存服务器上的数据不可信，不用 pickle（反序列化可执行任意代码）；
+# 空教室索引、提醒调度器等由 DataFrame 在各副本本地重建，不放入共享缓存
+def dumps(value):
+    if not isinstance(value, pd.DataFrame):
+        raise TypeError(f"共享缓存只支持 DataFrame，不支持 {type(value).__name__}")
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(to_columnar(value), preserve_index=False)
+    sink = io.BytesIO()
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return _ARROW + sink.getvalue()
+
+
+def loads(data):
+    kind, payload = data[:1], data[1:]
+    if kind != _ARROW:
+        raise ValueError(f"未知的缓存格式：{kind!r}")
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(pa.py_buffer(payload)).read_all()
+    return from_columnar(table.to_pandas(split_blocks=True))
+
+
+# ---------------------- 缓存后端 ----------------------
+# 后端只需实现按键读写字节；ttl 为过期秒数（None 表示不过期）
+class CacheBackend:
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def get_frame(self, key):
+        data = self.get(key)
+        return None if data is None else loads(data)
+
+    def set_frame(self, key, value, ttl=None):
+        self.set(key, dumps(value), ttl)
+
+    def close(self):
+        pass
+
+
+# 进程内缓存：按字节数限制容量，超出后淘汰最久未使用的键
+class MemoryBackend(CacheBackend):
+    def __init__(self, max_bytes=MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._remove(key)
+            self._items[key] = (value, None if ttl is None else time.time() + ttl)
+            self._size += len(value)
+            while self._size > self.max_bytes and len(self._items) > 1:
+                self._remove(next(iter(self._items)))
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._size -= len(item[0])
+
+
+# 磁盘缓存：每个键一个文件（先写临时文件再改名）；过期时间记在同名的 .ttl 文件中
+class DiskBackend(CacheBackend):
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key.replace(":", "_") + ".bin")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(f"{path}.ttl") as fp:
+                if float(fp.read()) <= time.time():
+                    self.delete(key)
+                    return None
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(path, "rb") as fp:
+                return fp.read()
+        except OSError:
+            return None
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fp:
+            fp.write(value)
+        os.replace(tmp_path, path)
+        if ttl is None:
+            if os.path.exists(f"{path}.ttl"):
+                os.remove(f"{path}.ttl")
+        else:
+            with open(f"{path}.ttl", "w") as fp:
+                fp.write(str(time.time() + ttl))
+
+    def delete(self, key):
+        path = self._path(key)
+        for name in (path, f"{path}.ttl"):
+            if os.path.exists(name):
+                os.remove(name)
+
+
+# Redis 协议（RESP）客户端：只用到 GET/SET/DEL，不依赖 redis-py
+class RedisBackend(CacheBackend):
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, timeout=5.0):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _call(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis 连接已断开")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            return None if count < 0 else [self._read_reply() for _ in range(count)]
+        raise RuntimeError(f"无法识别的 Redis 响应：{line!r}")
+
+    # 发送命令，连接断开时重连一次
+    def command(self, *args):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except (ConnectionError, OSError):
+                    self._close()
+                    if attempt:
+                        raise
+
+    def get(self, key):
+        return self.command("GET", key)
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            self.command("SET", key, value)
+        else:
+            self.command("SET", key, value, "EX", max(int(ttl), 1))
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+    def _close(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._reader = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+# 按地址创建缓存后端，地址为空时返回 None（不使用共享缓存）
+def open_backend(url=CACHE_URL):
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryBackend()
+    if parsed.scheme == "file":
+        return DiskBackend(parsed.path)
+    if parsed.scheme == "disk":
+        return DiskBackend(url[len("disk:"):])
+    if parsed.scheme == "redis":
+        db = int(parsed.path.strip("/") or 0)
+        return RedisBackend(parsed.hostname or "127.0.0.1", parsed.port or 6379, db, parsed.password)
+    raise ValueError(f"不支持的缓存地址：{url}")
+
+
+# ---------------------- 共享的课程表解析结果 ----------------------
+def timetable_key(data):
+    return TIMETABLE_PREFIX + cache_key(data)
+
+
+# 读取并解析课程表：先查共享缓存，未命中时解析（走本地列式缓存）并写回共享缓存
+# 缺少必需字段的原始表不写入共享缓存；缓存中的数据无法解析时当作未命中
+def load_timetable_shared(data, name, backend, cache_dir=None, progress=None):
+    if backend is None:
+        return load_timetable_cached(data, name, cache_dir, progress)
+    key = timetable_key(data)
+    try:
+        cached = backend.get_frame(key)
+    except (OSError, RuntimeError, ValueError):
+        cached = None
+    if cached is not None:
+        return cached
+
+    course_df = load_timetable_cached(data, name, cache_dir, progress)
+    if not course_df.empty and all(col in course_df.columns for col in (PREPARE_COLUMN, CHANGE_COLUMN)):
+        try:
+            backend.set_frame(key, course_df)
+        except (OSError, RuntimeError):
+            pass
+    return course_df
+
+
+# ---------------------- 本地 Redis 协议替身服务器（开发和测试用） ----------------------
+# 只实现缓存用到的命令：PING/GET/SET [EX]/DEL/EXISTS/SELECT/AUTH/FLUSHDB/DBSIZE
+class _RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if not line.startswith(b"*"):
+                continue
+            args = []
+            for _ in range(int(line[1:-2])):
+                length = int(self.rfile.readline()[1:-2])
+                args.append(self.rfile.read(length + 2)[:-2])
+            self.wfile.write(self.server.execute(args))
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _RespHandler)
+        self.store = {}
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def execute(self, args):
+        name = args[0].decode().upper()
+        with self.lock:
+            now = time.time()
+            for key in [key for key, (_, expires_at) in self.store.items() if expires_at and expires_at <= now]:
+                del self.store[key]
+            if name == "PING":
+                return b"+PONG\r\n"
+            if name in ("SELECT", "AUTH"):
+                return b"+OK\r\n"
+            if name == "GET":
+                item = self.store.get(args[1])
+                if item is None:
+                    return b"$-1\r\n"
+                return b"$%d\r\n%s\r\n" % (len(item[0]), item[0])
+            if name == "SET":
+                expires_at = None
+                if len(args) >= 5 and args[3].upper() == b"EX":
+                    expires_at = now + int(args[4])
+                self.store[args[1]] = (args[2], expires_at)
+                return b"+OK\r\n"
+            if name in ("DEL", "EXISTS"):
+                found = sum(1 for key in args[1:] if key in self.store)
+                if name == "DEL":
+                    for key in args[1:]:
+                        self.store.pop(key, None)
+                return b":%d\r\n" % found
+            if name == "FLUSHDB":
+                self.store.clear()
+                return b"+OK\r\n"
+            if name == "DBSIZE":
+                return b":%d\r\n" % len(self.store)
+        return f"-ERR unknown command '{name}'\r\n".encode()
+
+    # 在后台线程中启动服务器（测试中使用），返回服务器本身
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+# ---------------------- 命令行 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="共享缓存工具：预热课程表解析结果，或启动本地 Redis 协议替身服务器")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm = subparsers.add_parser("warm", help="解析课程表并写入共享缓存")
+    warm.add_argument("files", nargs="+", help="课程表文件（.xlsx / .csv）")
+    warm.add_argument("--url", default=CACHE_URL, required=not CACHE_URL, help="缓存地址（默认读取 KCB_CACHE_URL）")
+
+    serve = subparsers.add_parser("serve", help="启动本地 Redis 协议替身服务器")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = RespServer(args.host, args.port)
+        print(f"Redis 协议替身服务器已启动：redis://{args.host}:{server.port}/0")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    backend = open_backend(args.url)
+    for path in args.files:
+        with open(path, "rb") as fp:
+            data = fp.read()
+        key = timetable_key(data)
+        hit = backend.get(key) is not None
+        course_df = load_timetable_shared(data, os.path.basename(path), backend)
+        print(f"{'命中' if hit else '已写入'} {path} -> {key}（{len(course_df)} 行）")
+    backend.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import datetime
+
+import pandas as pd
+
+from ingest import canonicalize
+from keywords import PREPARE_COLUMN, extract_change_keywords, extract_prepare_keywords, parse_keywords
+from prep_digest import build_digests
+
+
+def test_prepare_keywords_ignore_case():
+    assert extract_prepare_keywords("带U盘") == ["U盘"]
+    assert extract_prepare_keywords("带u盘") == ["U盘"]
+    assert extract_prepare_keywords("带课本、u盘和耳机") == ["课本", "耳机", "U盘"]
+    assert extract_prepare_keywords("无") == ["无明确准备项"]
+    assert extract_prepare_keywords("") == []
+
+
+def test_change_keywords():
+    assert extract_change_keywords("本周调至星期五第6节") == ["调至"]
+    assert extract_change_keywords("正常上课") == ["无调课信息"]
+
+
+def test_digest_lists_u_disk():
+    course_df = parse_keywords(pd.DataFrame({
+        "课程名": ["计算机基础"],
+        "周次": ["1-16周"],
+        "星期": ["星期一"],
+        "节次": ["1-2"],
+        "教室": ["机房1"],
+        "课前准备": ["带u盘"],
+        "备注": [""],
+        "学生": ["张三"],
+    }))
+    assert course_df[PREPARE_COLUMN].tolist() == [["U盘"]]
+    digests = build_digests(canonicalize(course_df), datetime.date(2026, 9, 7), datetime.date(2026, 9, 7))
+    assert digests["准备清单"].tolist() == [[{"物品": "U盘", "课程": ["计算机基础"]}]]
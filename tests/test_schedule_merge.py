@@ -0,0 +1,63 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from charts import keyword_counts
+from keywords import CHANGE_COLUMN, PREPARE_COLUMN
+from reminder_scheduler import ReminderScheduler, check_reminder
+from schedule_merge import SOURCE_COLUMN, detect_time_clashes, merge_timetables
+
+# 2026-10-19 是星期一
+MONDAY = datetime.date(2026, 10, 19)
+
+
+def _timetable(name, section, prepare, note):
+    return pd.DataFrame({
+        "课程名": [name],
+        "周次": ["1-16周"],
+        "星期": ["星期一"],
+        "节次": [section],
+        "教室": ["A101"],
+        "课前准备": [prepare],
+        "备注": [note],
+    })
+
+
+def _merged():
+    return merge_timetables(
+        [_timetable("高等数学", "3-4", "带课本和耳机", ""), _timetable("大学英语", "3", "", "本周调至星期五第6节")],
+        ["必修.xlsx", "选修.xlsx"],
+    )
+
+
+def test_merged_timetable_has_keyword_columns():
+    merged = _merged()
+    assert merged[SOURCE_COLUMN].tolist() == ["必修.xlsx", "选修.xlsx"]
+    assert merged[PREPARE_COLUMN].tolist() == [["课本", "耳机"], []]
+    assert merged[CHANGE_COLUMN].tolist() == [[], ["调至"]]
+    assert len(detect_time_clashes(merged)) == 1
+
+
+def test_merged_timetable_drives_statistics():
+    merged = _merged()
+    assert keyword_counts(merged[PREPARE_COLUMN]).to_dict() == {"课本": 1, "耳机": 1}
+    assert keyword_counts(merged[CHANGE_COLUMN]).to_dict() == {"调至": 1}
+
+
+def test_merged_timetable_drives_reminders():
+    merged = _merged()
+    # 第3节 10:00 上课，09:00 为课前1小时提醒
+    reminders = check_reminder(merged, ("1h", "30m"), datetime.datetime.combine(MONDAY, datetime.time(9, 0)))
+    contents = [reminder["content"] for reminder in reminders]
+    assert any("高等数学" in content and "课本,耳机" in content for content in contents)
+    assert any("调课提醒" in content and "大学英语" in content for content in contents)
+
+    scheduler = ReminderScheduler(merged, ("evening",), start_date=MONDAY - datetime.timedelta(days=1))
+    evening = scheduler.active(datetime.datetime.combine(MONDAY - datetime.timedelta(days=1), datetime.time(21, 0)))
+    assert [reminder["course"] for reminder in evening if reminder["kind"] == "evening"] == ["高等数学"]
+
+
+def test_merge_rejects_missing_columns():
+    with pytest.raises(ValueError, match="选修.xlsx"):
+        merge_timetables([_timetable("高等数学", "1", "", ""), pd.DataFrame({"课程名": ["x"]})], ["必修.xlsx", "选修.xlsx"])
@@ -0,0 +1,347 @@
+import argparse
+import hashlib
+import os
+import queue
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from conflict_detector import EMPTY_ROOM_VALUES
+from ingest import (
+    END_MINUTE,
+    REQUIRED_COLUMNS,
+    SECTION_CODE,
+    SECTION_END_CODE,
+    START_MINUTE,
+    WEEKDAY_CODE,
+    WEEKDAY_LABELS,
+    canonicalize,
+    map_unique,
+    parse_weeks,
+    read_timetable,
+)
+from keywords import CHANGE_COLUMN, PREPARE_COLUMN, parse_keywords
+from schedule_merge import SOURCE_COLUMN
+from workbook_ingest import GROUP_COLUMN
+
+# ---------------------- 本地 SQLite 课程表库 ----------------------
+# 数据库文件位置（可用环境变量 KCB_DB_PATH 覆盖）
+DEFAULT_DB_PATH = os.environ.get("KCB_DB_PATH", "timetables.db")
+
+# 连接池大小
+POOL_SIZE = 4
+
+# 课程表字段 -> 表列名
+COURSE_FIELDS = {
+    "课程名": "course",
+    "周次": "weeks",
+    "星期": "weekday",
+    "节次": "section",
+    "教室": "classroom",
+    "课前准备": "preparation",
+    "备注": "note",
+    WEEKDAY_CODE: "weekday_code",
+    SECTION_CODE: "section_code",
+    SECTION_END_CODE: "section_end_code",
+    START_MINUTE: "start_minute",
+    END_MINUTE: "end_minute",
+}
+
+# 可选字段（多工作表课程表的班级、合并课程表的来源），课程表中没有时存为 NULL，读回时不生成该列
+OPTIONAL_FIELDS = {
+    GROUP_COLUMN: "group_name",
+    SOURCE_COLUMN: "source",
+}
+
+# 关键词类别
+KEYWORD_KINDS = {PREPARE_COLUMN: "prepare", CHANGE_COLUMN: "change"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS timetables (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_timetables_created ON timetables (created_at);
+CREATE TABLE IF NOT EXISTS courses (
+    timetable_id TEXT NOT NULL REFERENCES timetables(id) ON DELETE CASCADE,
+    row_no INTEGER NOT NULL,
+    course TEXT,
+    weeks TEXT,
+    weekday TEXT,
+    section TEXT,
+    classroom TEXT,
+    preparation TEXT,
+    note TEXT,
+    weekday_code INTEGER,
+    section_code INTEGER,
+    section_end_code INTEGER,
+    start_minute INTEGER,
+    end_minute INTEGER,
+    week_mask INTEGER NOT NULL,
+    group_name TEXT,
+    source TEXT,
+    PRIMARY KEY (timetable_id, row_no)
+);
+CREATE INDEX IF NOT EXISTS idx_courses_slot ON courses (timetable_id, weekday_code, section_code);
+CREATE INDEX IF NOT EXISTS idx_courses_classroom ON courses (timetable_id, classroom);
+CREATE INDEX IF NOT EXISTS idx_courses_course ON courses (timetable_id, course);
+CREATE TABLE IF NOT EXISTS keywords (
+    timetable_id TEXT NOT NULL REFERENCES timetables(id) ON DELETE CASCADE,
+    row_no INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    keyword TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_keywords_row ON keywords (timetable_id, row_no);
+CREATE INDEX IF NOT EXISTS idx_keywords_kind ON keywords (timetable_id, kind, keyword);
+"""
+
+
+# 课程表内容哈希（必需字段和可选字段），作为课程表ID
+def timetable_hash(course_df):
+    columns = [col for col in REQUIRED_COLUMNS + list(OPTIONAL_FIELDS) if col in course_df.columns]
+    hashes = pd.util.hash_pandas_object(course_df[columns].astype(str), index=False)
+    return hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+
+
+def _sql_value(value):
+    if value is None or (not isinstance(value, (list, tuple)) and pd.isna(value)):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# SQLite 课程表库：WAL 模式 + 连接池，多个会话可以同时读
+class TimetableStore:
+    def __init__(self, path=DEFAULT_DB_PATH, pool_size=POOL_SIZE):
+        self.path = str(path)
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(None)
+        with self.connection() as conn:
+            conn.executescript(_SCHEMA)
+            # 旧版本创建的库没有可选字段列，补上
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(courses)")}
+            for column in OPTIONAL_FIELDS.values():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE courses ADD COLUMN {column} TEXT")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    # 从连接池借出一个连接，用完归还；with 块内为一个事务
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            if conn is None:
+                conn = self._connect()
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            conn = self._pool.get_nowait()
+            if conn is not None:
+                conn.close()
+
+    # 保存课程表（含关键词解析结果），内容相同的课程表只保存一份，返回课程表ID
+    def save(self, course_df, name="课程表"):
+        course_df = canonicalize(course_df)
+        if PREPARE_COLUMN not in course_df.columns or CHANGE_COLUMN not in course_df.columns:
+            course_df = parse_keywords(course_df)
+        timetable_id = timetable_hash(course_df)
+
+        with self.connection() as conn:
+            # INSERT OR IGNORE 抢占课程表ID：两个会话同时保存同一份课程表时，只有插入成功的一方写课程行
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO timetables (id, name, row_count, created_at) VALUES (?, ?, ?, ?)",
+                (timetable_id, name, len(course_df), time.time()),
+            ).rowcount
+            if not inserted:
+                return timetable_id
+
+            week_masks = map_unique(course_df["周次"], parse_weeks).tolist()
+            columns = list(COURSE_FIELDS)
+            optional = [
+                course_df[field] if field in course_df.columns else pd.Series(None, index=course_df.index, dtype=object)
+                for field in OPTIONAL_FIELDS
+            ]
+            course_rows = (
+                (timetable_id, row_no, *[_sql_value(value) for value in values], mask,
+                 *[_sql_value(value) for value in extra])
+                for row_no, (values, mask, *extra) in enumerate(zip(
+                    course_df[columns].itertuples(index=False, name=None), week_masks, *optional
+                ))
+            )
+            conn.executemany(
+                f"INSERT INTO courses (timetable_id, row_no, {', '.join(COURSE_FIELDS.values())}, week_mask, "
+                f"{', '.join(OPTIONAL_FIELDS.values())}) "
+                f"VALUES ({', '.join('?' * (len(columns) + 3 + len(OPTIONAL_FIELDS)))})",
+                course_rows,
+            )
+            for column, kind in KEYWORD_KINDS.items():
+                conn.executemany(
+                    "INSERT INTO keywords (timetable_id, row_no, kind, position, keyword) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (timetable_id, row_no, kind, position, keyword)
+                        for row_no, keywords in enumerate(course_df[column])
+                        for position, keyword in enumerate(keywords or [])
+                    ),
+                )
+        return timetable_id
+
+    # 已保存的课程表列表（最新的在前）
+    def list_timetables(self):
+        with self.connection() as conn:
+            return pd.read_sql_query(
+                "SELECT id, name, row_count, created_at FROM timetables ORDER BY created_at DESC", conn
+            )
+
+    # 按ID前缀查找课程表（主键范围查询），最多返回 limit 个ID；prefix 为 None 时返回最近保存的课程表
+    def find_timetables(self, prefix=None, limit=2):
+        with self.connection() as conn:
+            if prefix is None:
+                rows = conn.execute("SELECT id FROM timetables ORDER BY created_at DESC LIMIT ?", (limit,))
+            else:
+                rows = conn.execute(
+                    "SELECT id FROM timetables WHERE id >= ? AND id < ? ORDER BY id LIMIT ?",
+                    (prefix, prefix + "\U0010ffff", limit),
+                )
+            return [row[0] for row in rows]
+
+    def delete(self, timetable_id):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM timetables WHERE id = ?", (timetable_id,))
+
+    # 查询课程行并还原为课程表字段（where 为附加在 timetable_id 之后的条件）
+    def _query_courses(self, conn, timetable_id, where="", params=()):
+        fields = {**COURSE_FIELDS, **OPTIONAL_FIELDS}
+        select = ", ".join(f'{column} AS "{field}"' for field, column in fields.items())
+        course_df = pd.read_sql_query(
+            f"SELECT row_no, {select} FROM courses WHERE timetable_id = ? {where} ORDER BY row_no",
+            conn,
+            params=(timetable_id, *params),
+        )
+        for field in (WEEKDAY_CODE, SECTION_CODE, SECTION_END_CODE):
+            course_df[field] = course_df[field].astype("Int8")
+        for field in (START_MINUTE, END_MINUTE):
+            course_df[field] = course_df[field].astype("Int16")
+        course_df = course_df.drop(columns=[field for field in OPTIONAL_FIELDS if course_df[field].isna().all()])
+
+        keyword_rows = pd.read_sql_query(
+            "SELECT k.row_no, k.kind, k.keyword FROM keywords k "
+            "JOIN courses c ON c.timetable_id = k.timetable_id AND c.row_no = k.row_no "
+            f"WHERE k.timetable_id = ? {where} ORDER BY k.row_no, k.kind, k.position",
+            conn,
+            params=(timetable_id, *params),
+        )
+        for column, kind in KEYWORD_KINDS.items():
+            grouped = keyword_rows[keyword_rows["kind"] == kind].groupby("row_no")["keyword"].agg(list)
+            course_df[column] = [grouped.get(row_no, []) for row_no in course_df["row_no"]]
+        return course_df.set_index("row_no").rename_axis(None)
+
+    # 读取整份课程表
+    def load(self, timetable_id):
+        with self.connection() as conn:
+            return self._query_courses(conn, timetable_id)
+
+    # 某天的课程（走 (星期, 节次) 索引），结果可直接交给 check_reminder
+    def courses_on(self, timetable_id, weekday):
+        with self.connection() as conn:
+            return self._query_courses(conn, timetable_id, "AND weekday_code = ?", (weekday,))
+
+    # 某教室的课程（走教室索引）
+    def courses_in(self, timetable_id, classroom):
+        with self.connection() as conn:
+            return self._query_courses(conn, timetable_id, "AND classroom = ?", (classroom,))
+
+    # 某门课程（走课程名索引）
+    def courses_named(self, timetable_id, course):
+        with self.connection() as conn:
+            return self._query_courses(conn, timetable_id, "AND course = ?", (course,))
+
+    # 第 week 周星期 weekday（1-7）第 section 节的空闲教室（教室为 "-"、"待定" 等占位值的不算，与 free_rooms.py 一致）
+    def free_rooms(self, timetable_id, week, weekday, section):
+        empty_values = sorted(EMPTY_ROOM_VALUES)
+        with self.connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT DISTINCT classroom FROM courses
+                WHERE timetable_id = ? AND classroom IS NOT NULL
+                  AND TRIM(classroom) NOT IN ({', '.join('?' * len(empty_values))})
+                  AND classroom NOT IN (
+                      SELECT classroom FROM courses
+                      WHERE timetable_id = ? AND weekday_code = ?
+                        AND section_code <= ? AND section_end_code >= ?
+                        AND (week_mask >> ?) & 1 AND classroom IS NOT NULL
+                  )
+                ORDER BY classroom
+                """,
+                (timetable_id, *empty_values, timetable_id, weekday, section, section, week - 1),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # 统计：每日课程数、各节次课程数、教室使用次数、调课数量
+    def statistics(self, timetable_id):
+        with self.connection() as conn:
+            by_weekday = dict(conn.execute(
+                "SELECT weekday_code, COUNT(*) FROM courses WHERE timetable_id = ? AND weekday_code IS NOT NULL "
+                "GROUP BY weekday_code ORDER BY weekday_code",
+                (timetable_id,),
+            ).fetchall())
+            by_section = dict(conn.execute(
+                "SELECT section_code, COUNT(*) FROM courses WHERE timetable_id = ? AND section_code IS NOT NULL "
+                "GROUP BY section_code ORDER BY section_code",
+                (timetable_id,),
+            ).fetchall())
+            by_classroom = dict(conn.execute(
+                "SELECT classroom, COUNT(*) AS n FROM courses WHERE timetable_id = ? "
+                "GROUP BY classroom ORDER BY n DESC",
+                (timetable_id,),
+            ).fetchall())
+            changes = conn.execute(
+                "SELECT COUNT(DISTINCT row_no) FROM keywords WHERE timetable_id = ? AND kind = 'change' "
+                "AND keyword != '无调课信息'",
+                (timetable_id,),
+            ).fetchone()[0]
+        return {
+            "每日课程数": {WEEKDAY_LABELS[code - 1]: n for code, n in by_weekday.items()},
+            "各节次课程数": by_section,
+            "教室使用次数": by_classroom,
+            "调课数量": changes,
+        }
+
+
+# ---------------------- 命令行导入/查询 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="将课程表导入本地 SQLite 库，或列出已保存的课程表")
+    parser.add_argument("files", nargs="*", help="要导入的课程表文件（.xlsx / .csv）")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="数据库文件路径")
+    args = parser.parse_args(argv)
+
+    store = TimetableStore(args.db)
+    for path in args.files:
+        timetable_id = store.save(read_timetable(path), os.path.basename(path))
+        print(f"✅ {path} -> {timetable_id}")
+
+    for row in store.list_timetables().itertuples(index=False):
+        print(f"{row.id[:12]}  {row.name}  {row.row_count} 行")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from columnar_cache import cache_key
+from shared_cache import load_timetable_shared
+
+# ---------------------- 后台解析任务队列 ----------------------
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# 后台解析线程数（可用环境变量 KCB_UPLOAD_WORKERS 覆盖）
+UPLOAD_WORKERS = int(os.environ.get("KCB_UPLOAD_WORKERS", "2"))
+
+# 单个文件大小上限（MB，可用环境变量 KCB_MAX_UPLOAD_MB 覆盖）
+MAX_UPLOAD_MB = float(os.environ.get("KCB_MAX_UPLOAD_MB", "50"))
+
+# 排队任务数上限，超出后拒绝新提交（可用环境变量 KCB_MAX_QUEUED_UPLOADS 覆盖）
+MAX_QUEUED_JOBS = int(os.environ.get("KCB_MAX_QUEUED_UPLOADS", "32"))
+
+# 同时解析的文件总大小上限（MB）：openpyxl 解析时内存占用是文件大小的数十倍，按字节数限流
+# 单个文件超过该值时仍可解析，但只能独占执行（可用环境变量 KCB_PARSE_BUDGET_MB 覆盖）
+PARSE_BUDGET_MB = float(os.environ.get("KCB_PARSE_BUDGET_MB", "80"))
+
+# 有提醒/统计等交互式重跑进行时，解析降为低优先级而不是暂停：最多同时解析的任务数，
+# 以及解析任务在阶段之间最多让出的时间（秒）；交互式重跑持续不断时解析仍能推进
+INTERACTIVE_WORKERS = 1
+INTERACTIVE_YIELD_SECONDS = 0.2
+
+# 最多保留的已结束任务（结果为解析后的 DataFrame，超出后淘汰最早结束的）
+MAX_FINISHED_JOBS = 32
+
+# 界面轮询任务状态的间隔（秒）
+POLL_INTERVAL = 0.5
+
+
+# 上传被拒绝（文件过大或队列已满），message 可直接展示给用户；retry 表示稍后重新提交可能成功
+class UploadRejected(Exception):
+    def __init__(self, message, retry=False):
+        super().__init__(message)
+        self.retry = retry
+
+
+# 一次上传的解析任务；状态字段只由工作线程写入，界面线程直接读取
+class UploadJob:
+    def __init__(self, job_id, name, size):
+        self.id = job_id
+        self.name = name
+        self.size = size
+        self.status = QUEUED
+        self.progress = 0.0
+        self.stage = "排队中"
+        self.priority = 0
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    # 进度回调（由 load_timetable_cached 调用）
+    def report(self, fraction, stage):
+        self.progress = fraction
+        self.stage = stage
+
+    # 不含结果的状态快照，供界面轮询或接口返回
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "size": self.size,
+            "status": self.status,
+            "progress": self.progress,
+            "stage": self.stage,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# 上传解析任务队列：任务ID即文件内容哈希，同一文件重复提交时合并为同一个任务
+# 解析在线程池中进行，Streamlit 脚本只需提交任务并轮询状态，不会被整份课程表的解析卡住
+# 配置了共享缓存后端时，其他副本解析过的文件直接从共享缓存取回
+# 准入控制：单文件大小上限、排队数上限（满了直接拒绝，由界面稍后重试）、
+# 并发数和同时解析的总字节数上限；排队任务按 (优先级, 提交顺序) 调度
+# 提醒/统计等交互式重跑在 interactive() 中进行：期间最多 INTERACTIVE_WORKERS 个解析同时进行（不会完全暂停），
+# 进行中的解析在阶段之间（检查缓存、读取文件、解析关键词、写入缓存）最多等待 INTERACTIVE_YIELD_SECONDS。
+# 解析线程与重跑共用 GIL，阶段内部（如 openpyxl 读取）无法让出，降低优先级只发生在阶段之间
+class UploadJobQueue:
+    def __init__(
+        self,
+        max_workers=UPLOAD_WORKERS,
+        max_finished=MAX_FINISHED_JOBS,
+        cache_dir=None,
+        backend=None,
+        max_upload_mb=MAX_UPLOAD_MB,
+        max_queued=MAX_QUEUED_JOBS,
+        parse_budget_mb=PARSE_BUDGET_MB,
+    ):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self.cache_dir = cache_dir
+        self.backend = backend
+        self.max_upload_bytes = int(max_upload_mb * 1024 * 1024)
+        self.max_queued = max_queued
+        self.parse_budget_bytes = int(parse_budget_mb * 1024 * 1024)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kcb-upload")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._interactive_done = threading.Condition(self._lock)
+        self._pending = []
+        self._order = itertools.count()
+        self._running = 0
+        self._running_bytes = 0
+        self._interactive = 0
+
+    # 提交上传的文件，返回任务；已有同一文件的任务（排队中、解析中或已完成）时直接返回该任务，失败的任务会重新提交
+    # priority 越小越先解析；文件过大或排队已满时抛出 UploadRejected
+    def submit(self, data, name, priority=0):
+        if len(data) > self.max_upload_bytes:
+            raise UploadRejected(
+                f"文件大小 {len(data) / 1024 / 1024:.1f} MB 超过上限 {self.max_upload_bytes / 1024 / 1024:g} MB"
+            )
+        job_id = cache_key(data)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status != FAILED:
+                return job
+            if len(self._pending) >= self.max_queued:
+                raise UploadRejected("当前解析任务较多，请稍后重试", retry=True)
+            job = UploadJob(job_id, name, len(data))
+            job.priority = priority
+            self._jobs[job_id] = job
+            self._jobs.move_to_end(job_id)
+            heapq.heappush(self._pending, (priority, next(self._order), job, data))
+            self._dispatch()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    # 所有任务的状态快照（最新提交的在后）
+    def jobs(self):
+        with self._lock:
+            return [job.snapshot() for job in self._jobs.values()]
+
+    # 排队中的任务在队列中的位置（从 1 开始），不在排队时返回 None
+    def position(self, job_id):
+        with self._lock:
+            waiting = [job.id for _, _, job, _ in sorted(self._pending)]
+        return waiting.index(job_id) + 1 if job_id in waiting else None
+
+    # 调度统计：排队数、解析中数量和字节数、正在进行的交互式重跑数
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": len(self._pending),
+                "running": self._running,
+                "running_bytes": self._running_bytes,
+                "interactive": self._interactive,
+            }
+
+    # 交互式重跑（提醒、统计）期间调用：解析并发数降到 INTERACTIVE_WORKERS，结束后恢复
+    @contextmanager
+    def interactive(self):
+        with self._lock:
+            self._interactive += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._interactive -= 1
+                if self._interactive == 0:
+                    self._interactive_done.notify_all()
+                    self._dispatch()
+
+    # 在并发数和字节预算允许时启动排队的任务（调用方持有锁）
+    # 没有任务在解析时，超过预算的单个文件也可以启动，避免大文件永远排不上
+    def _dispatch(self):
+        workers = min(self.max_workers, INTERACTIVE_WORKERS) if self._interactive else self.max_workers
+        while self._pending and self._running < workers:
+            _, _, job, data = self._pending[0]
+            if self._running and self._running_bytes + job.size > self.parse_budget_bytes:
+                break
+            heapq.heappop(self._pending)
+            self._running += 1
+            self._running_bytes += job.size
+            self._executor.submit(self._run, job, data)
+
+    # 解析阶段之间的检查点：有交互式重跑时短暂让出（最多等待 INTERACTIVE_YIELD_SECONDS），不会一直等下去
+    def _checkpoint(self, job, fraction, stage):
+        with self._lock:
+            if self._interactive:
+                self._interactive_done.wait_for(lambda: self._interactive == 0, INTERACTIVE_YIELD_SECONDS)
+        job.report(fraction, stage)
+
+    def _run(self, job, data):
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.report(0.0, "解析中")
+        try:
+            job.result = load_timetable_shared(
+                data, job.name, self.backend, self.cache_dir,
+                progress=lambda fraction, stage: self._checkpoint(job, fraction, stage),
+            )
+            job.report(1.0, "完成")
+            job.status = DONE
+        except Exception as exc:
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.stage = "失败"
+            job.status = FAILED
+        job.finished_at = time.time()
+        with self._lock:
+            self._running -= 1
+            self._running_bytes -= job.size
+            self._dispatch()
+        self._evict()
+
+    # 已结束的任务超过上限时，淘汰最早结束的任务（正在进行的任务不受影响）
+    def _evict(self):
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at
+            )
+            for job in finished[:max(len(finished) - self.max_finished, 0)]:
+                del self._jobs[job.id]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
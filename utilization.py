@@ -0,0 +1,141 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from free_rooms import SECTIONS, build_occupancy_index, section_index
+from ingest import TERM_WEEKS, WEEKDAY_LABELS, read_timetable, weekday_index
+
+# ---------------------- 教室使用率立方体 ----------------------
+# 立方体的四个维度（顺序即数组的轴顺序）
+AXES = ("教室", "周次", "星期", "节次")
+
+# 按教室展开的热力图最多显示的教室数（按全学期使用率从高到低）
+MAX_HEATMAP_ROOMS = 30
+
+
+# 教室使用率立方体：教室 × 周次 × 星期 × 节次 的占用数组（1 表示该时段有课），由空教室占用索引生成。
+# 去掉任一维度的汇总在构建时算好，其余汇总在第一次用到时由最小的已缓存汇总求和得到并缓存，
+# 因此任意切片都只是对小数组的一次 NumPy 求和，不再对课程表做 groupby
+class UtilizationCube:
+    def __init__(self, occupancy):
+        self.rooms = list(occupancy.rooms)
+        self.cube = (occupancy.counts[:len(self.rooms)] > 0).astype(np.uint8)
+        self.labels = {
+            "教室": self.rooms,
+            "周次": [f"第{week}周" for week in range(1, TERM_WEEKS + 1)],
+            "星期": WEEKDAY_LABELS,
+            "节次": [f"第{section}节" for section in SECTIONS],
+        }
+        self._room_index = {room: i for i, room in enumerate(self.rooms)}
+        self._rollups = {AXES: self.cube}
+        for axis in AXES:
+            self.rollup([other for other in AXES if other != axis])
+
+    # 保留 axes 维度、其余维度求和后的数组（轴按 AXES 顺序）
+    def rollup(self, axes):
+        kept = tuple(axis for axis in AXES if axis in axes)
+        cached = self._rollups.get(kept)
+        if cached is None:
+            source_key = min(
+                (key for key in self._rollups if set(kept) <= set(key)),
+                key=lambda key: self._rollups[key].size,
+            )
+            drop = tuple(i for i, axis in enumerate(source_key) if axis not in kept)
+            cached = self._rollups[source_key].sum(axis=drop, dtype=np.int32)
+            self._rollups[kept] = cached
+        return cached
+
+    # 汇总后每个格子包含的原始时段数（用于把使用次数换算为使用率）
+    def capacity(self, axes):
+        return int(np.prod([len(self.labels[axis]) for axis in AXES if axis not in axes]))
+
+    # 筛选条件 -> 下标：教室为名称，周次为 1 起的周数，星期为名称或 1-7，节次为节次编号
+    def _position(self, axis, value):
+        if axis == "教室":
+            position = self._room_index.get(value)
+        elif axis == "周次":
+            position = int(value) - 1 if 1 <= int(value) <= TERM_WEEKS else None
+        elif axis == "星期":
+            position = weekday_index(value)
+        else:
+            position = section_index(value)
+        if position is None:
+            raise ValueError(f"无法识别的{axis}：{value}")
+        return position
+
+    # 切片：rows（和可选的 cols）为保留的维度，filters 为 {维度: 取值} 的筛选条件；
+    # rate=True 时返回使用率（0-1），否则返回有课的时段数
+    def slice(self, rows, cols=None, filters=None, rate=False):
+        filters = filters or {}
+        shown = [rows] if cols is None else [rows, cols]
+        kept = tuple(axis for axis in AXES if axis in shown or axis in filters)
+        data = self.rollup(kept)
+        for axis, value in filters.items():
+            if axis in shown:
+                continue
+            data = np.take(data, self._position(axis, value), axis=kept.index(axis))
+            kept = tuple(other for other in kept if other != axis)
+        data = np.transpose(data, [kept.index(axis) for axis in shown])
+        if rate:
+            data = data / self.capacity(kept + tuple(filters))
+
+        index = self.labels[rows]
+        if cols is None:
+            result = pd.Series(data, index=index, name="使用率" if rate else "使用时段数")
+        else:
+            result = pd.DataFrame(data, index=index, columns=self.labels[cols])
+        # 保留维度本身也有筛选条件时，只保留该取值
+        for axis, value in filters.items():
+            if axis in shown:
+                label = self.labels[axis][self._position(axis, value)]
+                result = result.loc[[label]] if axis == rows else result[[label]]
+        return result
+
+    # 按全学期使用率排序的教室（从高到低）
+    def busiest_rooms(self, limit=MAX_HEATMAP_ROOMS):
+        usage = self.rollup(("教室",))
+        order = np.argsort(-usage, kind="stable")[:limit]
+        return [self.rooms[i] for i in order]
+
+
+# 由课程表构建使用率立方体
+def build_utilization_cube(course_df):
+    return UtilizationCube(build_occupancy_index(course_df))
+
+
+# ---------------------- 命令行查询 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按教室、周次、星期、节次统计教室使用率")
+    parser.add_argument("files", nargs="+", help="课程表文件（.xlsx / .csv），多个文件会合并统计")
+    parser.add_argument("--rows", choices=AXES, default="星期", help="行维度")
+    parser.add_argument("--cols", choices=AXES, default="节次", help="列维度")
+    parser.add_argument("--room", help="只统计某间教室")
+    parser.add_argument("--week", type=int, help="只统计某一周")
+    parser.add_argument("--output", help="输出 CSV 文件（默认打印）")
+    args = parser.parse_args(argv)
+    if args.rows == args.cols:
+        parser.error("行维度和列维度不能相同")
+
+    course_df = pd.concat([read_timetable(path) for path in args.files], ignore_index=True)
+    cube = build_utilization_cube(course_df)
+    filters = {}
+    if args.room:
+        filters["教室"] = args.room
+    if args.week:
+        filters["周次"] = args.week
+    table = cube.slice(args.rows, args.cols, filters, rate=True)
+    if args.rows == "教室" and not args.room:
+        table = table.loc[cube.busiest_rooms()]
+
+    if args.output:
+        table.to_csv(args.output, encoding="utf-8-sig")
+        print(f"✅ 已导出：{args.output}")
+    else:
+        print(table.round(2).to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import argparse
+import html
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ingest import (
+    CLASS_TIME_MAP,
+    SECTION_CODE,
+    SECTION_END_CODE,
+    TERM_WEEKS,
+    WEEKDAY_CODE,
+    WEEKDAY_LABELS,
+    canonicalize,
+    map_unique,
+    parse_weeks,
+    read_timetable,
+    week_list,
+)
+
+# ---------------------- 周课表（星期 × 节次） ----------------------
+# 节次行数（按作息表）
+GRID_SECTIONS = len(CLASS_TIME_MAP)
+
+# 每个格子最多列出的课程数（合并后的大课程表中同一时段课程很多时，其余只显示数量）
+MAX_CELL_COURSES = 6
+
+# 周课表表格的样式（嵌入生成的 HTML 中）
+GRID_STYLE = """
+<style>
+.week-grid { width: 100%; border-collapse: collapse; table-layout: fixed; font-size: 0.85rem; }
+.week-grid th, .week-grid td { border: 1px solid #e1e5f7; padding: 4px; vertical-align: top; text-align: center; }
+.week-grid th { background: #f8f9ff; }
+.week-grid td.section { background: #f8f9ff; font-weight: bold; width: 5.5rem; }
+.week-grid .course { background: #eef0ff; border-left: 3px solid #667eea; border-radius: 4px; margin-bottom: 2px; padding: 2px; }
+.week-grid .room { color: #666; font-size: 0.75rem; }
+</style>
+"""
+
+
+# 周课表：布局（显示哪些星期、每个格子里有哪些课程、课程的显示文字和周次位图）在构建时算好一次，
+# 切换周次时只按周次位图筛选各格子中的课程，再用缓存的表格骨架填充
+class WeekGrid:
+    def __init__(self, course_df):
+        course_df = canonicalize(course_df)
+        weekdays = course_df[WEEKDAY_CODE]
+        first = course_df[SECTION_CODE]
+        last = course_df[SECTION_END_CODE]
+        valid = (weekdays.notna() & first.notna() & (first >= 1) & (first <= GRID_SECTIONS)).to_numpy(dtype=bool)
+        rows = np.flatnonzero(valid)
+
+        weekday = weekdays.to_numpy(dtype=np.float64)[rows].astype(np.int64) - 1
+        first = first.to_numpy(dtype=np.float64)[rows].astype(np.int64) - 1
+        last = np.clip(last.to_numpy(dtype=np.float64)[rows].astype(np.int64) - 1, first, GRID_SECTIONS - 1)
+        masks = map_unique(course_df["周次"], parse_weeks).to_numpy(dtype=np.int64)[rows]
+        labels = (
+            '<div class="course">' + course_df["课程名"].astype(str).map(html.escape).to_numpy()[rows]
+            + '<div class="room">' + course_df["教室"].astype(str).map(html.escape).to_numpy()[rows]
+            + "</div></div>"
+        )
+
+        # 连堂课在每一节的格子里各出现一次：展开为 (格子, 课程) 对，按格子排序
+        lengths = last - first + 1
+        item_row = np.repeat(np.arange(len(rows)), lengths)
+        offsets = np.arange(len(item_row)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        cell = (first[item_row] + offsets) * 7 + weekday[item_row]
+        order = np.argsort(cell, kind="stable")
+        self.cells = cell[order]
+        self.item_masks = masks[item_row][order]
+        self.item_labels = labels[item_row][order]
+        self.rows = rows[item_row][order]
+
+        # 周末没有任何课程时不显示周末两列
+        used_days = set(weekday.tolist())
+        self.weekdays = [day for day in range(7) if day < 5 or day in used_days]
+        self.weeks = week_list(int(np.bitwise_or.reduce(masks))) if len(masks) else []
+        self._skeleton = self._build_skeleton()
+        self._rendered = {}
+
+    # 表格骨架：表头和每节的行标题，课程内容位置留空；布局不随周次变化
+    def _build_skeleton(self):
+        header = "".join(f"<th>{WEEKDAY_LABELS[day]}</th>" for day in self.weekdays)
+        rows = []
+        for section, start in enumerate(CLASS_TIME_MAP.values()):
+            heading = f'<td class="section">第{section + 1}节<br><span class="room">{start}</span></td>'
+            rows.append((heading, [section * 7 + day for day in self.weekdays]))
+        return f'<table class="week-grid"><tr><th></th>{header}</tr>', rows
+
+    # 第 week 周（None 表示全学期）各格子中的课程下标，{格子: 下标数组}
+    def cell_items(self, week=None):
+        if week is None:
+            active = np.arange(len(self.cells))
+        else:
+            active = np.flatnonzero((self.item_masks >> (week - 1)) & 1)
+        cells = self.cells[active]
+        bounds = np.flatnonzero(np.diff(cells)) + 1
+        return {
+            int(group_cells[0]): group
+            for group_cells, group in zip(np.split(cells, bounds), np.split(active, bounds))
+            if len(group)
+        }
+
+    # 渲染第 week 周的 HTML 周课表（每周只渲染一次）
+    def render(self, week=None):
+        if week not in self._rendered:
+            items = self.cell_items(week)
+            head, rows = self._skeleton
+            body = []
+            for heading, cells in rows:
+                tds = "".join(f"<td>{self._cell_html(items.get(cell))}</td>" for cell in cells)
+                body.append(f"<tr>{heading}{tds}</tr>")
+            self._rendered[week] = GRID_STYLE + head + "".join(body) + "</table>"
+        return self._rendered[week]
+
+    def _cell_html(self, item_ids):
+        if item_ids is None:
+            return ""
+        shown = "".join(self.item_labels[item_ids[:MAX_CELL_COURSES]])
+        if len(item_ids) > MAX_CELL_COURSES:
+            shown += f'<div class="room">另有 {len(item_ids) - MAX_CELL_COURSES} 门课程</div>'
+        return shown
+
+    # 第 week 周的周课表 DataFrame（行为节次，列为星期，格子内为课程行号列表），便于导出或进一步处理
+    def to_frame(self, week=None):
+        items = self.cell_items(week)
+        return pd.DataFrame(
+            [[self.rows[items[section * 7 + day]].tolist() if section * 7 + day in items else []
+              for day in self.weekdays] for section in range(GRID_SECTIONS)],
+            index=[f"第{section}节" for section in CLASS_TIME_MAP],
+            columns=[WEEKDAY_LABELS[day] for day in self.weekdays],
+        )
+
+
+# ---------------------- 命令行导出 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成课程表的周课表（星期 × 节次）HTML")
+    parser.add_argument("file", help="课程表文件（.xlsx / .csv）")
+    parser.add_argument("--week", type=int, help=f"第几周（1-{TERM_WEEKS}），默认显示全学期")
+    parser.add_argument("--output", required=True, help="输出的 HTML 文件")
+    args = parser.parse_args(argv)
+
+    grid = WeekGrid(read_timetable(args.file))
+    with open(args.output, "w", encoding="utf-8") as fp:
+        fp.write(f'<html><head><meta charset="utf-8"></head><body>{grid.render(args.week)}</body></html>')
+    print(f"✅ 已生成周课表：{args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import argparse
+import io
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from ingest import REQUIRED_COLUMNS, canonicalize
+from keywords import parse_keywords
+
+# ---------------------- 多工作表课程表（每个班级一个工作表） ----------------------
+# 合并后标记每行来自哪个工作表（班级）
+GROUP_COLUMN = "班级"
+
+# 解析失败的工作表记录在 DataFrame.attrs 中的键：{工作表名: 错误信息}
+SHEET_ERRORS = "sheet_errors"
+
+
+# 工作簿中的工作表名称（只读模式，不加载单元格）
+def sheet_names(source):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+# 解析一批工作表：每个工作进程只打开一次工作簿
+# 返回 [(工作表名, 解析结果或 None, 错误信息或 None)]，单个工作表失败不影响其他工作表
+def _parse_sheets(path, names):
+    results = []
+    with pd.ExcelFile(path, engine="openpyxl") as workbook:
+        for name in names:
+            try:
+                raw = workbook.parse(name)
+                missing = [col for col in REQUIRED_COLUMNS if col not in raw.columns]
+                if raw.empty:
+                    results.append((name, None, "空工作表"))
+                elif missing:
+                    results.append((name, None, f"缺少必需字段：{', '.join(missing)}"))
+                else:
+                    results.append((name, parse_keywords(canonicalize(raw)), None))
+            except Exception as exc:
+                results.append((name, None, f"{type(exc).__name__}: {exc}"))
+    return results
+
+
+# 读取多工作表课程表：工作表按轮转分给进程池，各进程解析后合并为一张表并加上班级列
+def read_workbook(path, max_workers=None, group_column=GROUP_COLUMN):
+    names = sheet_names(path)
+    workers = min(max_workers or os.cpu_count() or 1, len(names)) or 1
+
+    if workers == 1:
+        results = _parse_sheets(path, names)
+    else:
+        batches = [names[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            batch_results = pool.map(_parse_sheets, [path] * workers, batches)
+            parsed = {name: (df, error) for batch in batch_results for name, df, error in batch}
+        results = [(name, *parsed[name]) for name in names]
+
+    frames = [df.assign(**{group_column: name}) for name, df, error in results if df is not None]
+    errors = {name: error for name, df, error in results if error is not None}
+    if frames:
+        course_df = pd.concat(frames, ignore_index=True)
+    else:
+        course_df = pd.DataFrame(columns=REQUIRED_COLUMNS + [group_column])
+    course_df.attrs[SHEET_ERRORS] = errors
+    return course_df
+
+
+# 工作簿字节是否包含多个工作表
+def is_multi_sheet(data):
+    return len(sheet_names(io.BytesIO(data))) > 1
+
+
+# 从上传的字节读取多工作表课程表（写入临时文件，供各进程按路径打开）
+def read_workbook_bytes(data, max_workers=None, group_column=GROUP_COLUMN):
+    with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp:
+        tmp.write(data)
+    try:
+        return read_workbook(tmp.name, max_workers, group_column)
+    finally:
+        os.remove(tmp.name)
+
+
+# ---------------------- 命令行解析 ----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="并行解析多工作表课程表（每个班级一个工作表）并合并")
+    parser.add_argument("workbook", help="课程表工作簿（.xlsx）")
+    parser.add_argument("--workers", type=int, help="进程数（默认使用全部CPU核）")
+    parser.add_argument("--output", help="将合并后的课程表另存为CSV文件")
+    args = parser.parse_args(argv)
+
+    course_df = read_workbook(args.workbook, args.workers)
+    errors = course_df.attrs[SHEET_ERRORS]
+    groups = course_df[GROUP_COLUMN].nunique()
+    print(f"✅ 已解析 {groups} 个工作表，共 {len(course_df)} 门课程")
+    for name, error in errors.items():
+        print(f"⚠️ 工作表「{name}」解析失败：{error}")
+
+    if args.output:
+        course_df.to_csv(args.output, index=False, encoding="utf-8-sig")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())